@@ -0,0 +1,246 @@
+# bench.py – host-side benchmarks for the fuzzy engines.
+# Runs under CPython or the MicroPython unix port, from pico/:
+#   python bench.py           run and compare against the stored baseline
+#   python bench.py --save    run and store the results as the new baseline
+#   python bench.py --quick   fewer iterations (smoke run)
+#
+# The baseline (bench_baseline.json, next to this file) is not committed:
+# ops/sec depends on the machine and interpreter. To produce one, check out
+# the reference commit, run "python bench.py --save" on the machine you
+# will compare on, then switch to the change and run "python bench.py".
+
+import gc
+import json
+import sys
+
+from fuzz.fuzzy_core import FuzzyCore
+from fuzz.fixed_core import FixedFuzzyCore
+from fuzz.membership import gaussian, trapezoidal, triangular
+from fuzz import fuzzy_config as cfg
+
+# Next to this file whatever the working directory (no os.path on MicroPython).
+_cut = max(__file__.rfind("/"), __file__.rfind("\\"))
+BASELINE_FILE = __file__[:_cut + 1] + "bench_baseline.json"
+SLOWER_TOL = 0.20       # Flag if ops/sec drops by more than 20 %.
+ALLOC_TOL = 0.20        # Flag if bytes/call grows by more than 20 % ...
+ALLOC_SLACK = 64        # ... and by more than this many bytes.
+
+
+# Timing and allocation probes (MicroPython or CPython).
+# ------------------------------------------------------ #
+try:
+    from time import ticks_us, ticks_diff
+
+    def _now_us():
+        return ticks_us()
+
+    def _elapsed_us(t0):
+        return ticks_diff(ticks_us(), t0)
+except ImportError:
+    from time import perf_counter
+
+    def _now_us():
+        return perf_counter()
+
+    def _elapsed_us(t0):
+        return (perf_counter() - t0) * 1e6
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+def _alloc_bytes(fn, arg):
+    """Bytes allocated by one call (MicroPython heap delta or CPython peak)."""
+    if hasattr(gc, "mem_alloc"):
+        gc.collect()
+        gc.disable()
+        before = gc.mem_alloc()
+        fn(arg)
+        used = gc.mem_alloc() - before
+        gc.enable()
+        return used
+    if tracemalloc is None:
+        return -1
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    fn(arg)
+    used = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return used
+
+
+def _bench(fn, args, iterations):
+    """Return (ops/sec, bytes allocated per call) for fn over cycled args."""
+    for a in args[:4]:
+        fn(a)   # Warm up.
+    n = len(args)
+    gc.collect()
+    t0 = _now_us()
+    for i in range(iterations):
+        fn(args[i % n])
+    us = _elapsed_us(t0) or 1
+    alloc = max(_alloc_bytes(fn, args[i % n]) for i in range(min(n, 8)))
+    return iterations * 1e6 / us, alloc
+
+
+# Benchmark configurations.
+# ------------------------- #
+def shipped():
+    """The fuzzy_config that ships on the device."""
+    return {
+        "input_sets": cfg.input_sets,
+        "output_sets": cfg.output_sets,
+        "output_ranges": cfg.output_ranges,
+        "rules": cfg.mamdani_rules,
+        "sample_steps": cfg.sample_steps,
+        "defuzz_methods": cfg.defuzz_methods,
+    }
+
+
+def synthetic(n_inputs, n_labels, freq_step):
+    """
+    Larger rule base: n_inputs inputs with n_labels Gaussian sets each,
+    one rule per label combination, and a freq domain sampled every
+    freq_step Hz.
+    """
+    span = 3000 // n_labels
+    input_sets = {}
+    for i in range(n_inputs):
+        input_sets["in%d" % i] = {"l%d" % j: gaussian(j * span + span // 2, span * 0.6)
+                                  for j in range(n_labels)}
+
+    width = 100 // n_labels
+    duty_sets = {}
+    freq_sets = {}
+    for j in range(n_labels):
+        lo = j * width
+        if j % 2:
+            duty_sets["l%d" % j] = triangular(lo - width // 2, lo + width // 2, lo + width + width // 2)
+        else:
+            duty_sets["l%d" % j] = trapezoidal(lo - width // 2, lo, lo + width, lo + width + width // 2)
+        freq_sets["l%d" % j] = gaussian(100 + j * 1900 // n_labels, 1900 // n_labels)
+
+    rules = []
+    combos = [[]]
+    for _ in range(n_inputs):
+        combos = [c + [j] for c in combos for j in range(n_labels)]
+    for combo in combos:
+        out = "l%d" % (sum(combo) % n_labels)
+        rules.append({"if": {"in%d" % i: "l%d" % j for i, j in enumerate(combo)},
+                      "then": {"duty": out, "freq": out}})
+
+    return {
+        "input_sets": input_sets,
+        "output_sets": {"duty": duty_sets, "freq": freq_sets},
+        "output_ranges": {"duty": (0, 100), "freq": (100, 2000)},
+        "rules": rules,
+        "sample_steps": {"freq": freq_step},
+        "defuzz_methods": {"duty": "analytic", "freq": "sampled"},
+    }
+
+
+def _inputs_for(conf, count=32):
+    names = list(conf["input_sets"])
+    return [{name: 100 + (k * 97 + i * 331) % 2900 for i, name in enumerate(names)}
+            for k in range(count)]
+
+
+# Suite.
+# ------ #
+def run(iterations):
+    results = {}
+
+    def record(name, fn, args, iters=iterations):
+        ops, alloc = _bench(fn, args, iters)
+        results[name] = {"ops": ops, "alloc": alloc}
+        print("%-44s %12.0f ops/s %8d B/call" % (name, ops, alloc))
+
+    # Membership functions.
+    xs = list(range(0, 3000, 37))
+    record("membership/triangular", triangular(30, 50, 70), xs, iterations * 10)
+    record("membership/trapezoidal", trapezoidal(0, 0, 20, 40), xs, iterations * 10)
+    record("membership/gaussian", gaussian(1000, 300), xs, iterations * 10)
+
+    cases = [
+        ("shipped", shipped()),
+        ("synthetic-2x5", synthetic(2, 5, 10)),
+        ("synthetic-3x5-fine", synthetic(3, 5, 1)),
+    ]
+    for name, conf in cases:
+        core = FuzzyCore(conf["input_sets"], conf["output_sets"], conf["rules"],
+                         conf["output_ranges"], defuzz_methods=conf["defuzz_methods"],
+                         sample_steps=conf["sample_steps"])
+        inputs = _inputs_for(conf)
+        fuzzified = [core.fuzzify(x) for x in inputs]
+        activations = []
+        for f in fuzzified:
+            acts = core.apply_rules(f)
+            activations.append({out: dict(labels) for out, labels in acts.items()})
+        iters = max(1, iterations // max(1, len(conf["rules"]) // 4))
+
+        record(name + "/fuzzify", core.fuzzify, inputs, iters)
+        record(name + "/apply_rules", core.apply_rules, fuzzified, iters)
+        record(name + "/aggregate_and_defuzzify", core.aggregate_and_defuzzify, activations, iters)
+        record(name + "/compute", core.compute, inputs, iters)
+
+        fixed = FixedFuzzyCore(conf["input_sets"], conf["output_sets"], conf["rules"],
+                               conf["output_ranges"], sample_steps=conf["sample_steps"])
+        record(name + "/fixed_compute", fixed.compute, inputs, iters)
+
+    # Single-input fast paths on the shipped config.
+    conf = shipped()
+    inputs = _inputs_for(conf)
+    lut = FuzzyCore(conf["input_sets"], conf["output_sets"], conf["rules"],
+                    conf["output_ranges"], defuzz_methods=conf["defuzz_methods"],
+                    sample_steps=conf["sample_steps"], lut_range=(100, 3000),
+                    lut_step=cfg.lut_step or 20)
+    record("shipped/compute_lut", lut.compute, inputs, iterations * 10)
+    sugeno = FuzzyCore(conf["input_sets"], conf["output_sets"], cfg.sugeno_rules,
+                       conf["output_ranges"])
+    record("shipped/compute_sugeno", sugeno.compute, inputs, iterations)
+
+    return results
+
+
+def compare(results, baseline):
+    """Print regressions against the baseline; return how many were found."""
+    regressions = 0
+    for name, now in results.items():
+        ref = baseline.get(name)
+        if ref is None:
+            continue
+        if now["ops"] < ref["ops"] * (1 - SLOWER_TOL):
+            print("REGRESSION %s: %.0f ops/s (baseline %.0f)" % (name, now["ops"], ref["ops"]))
+            regressions += 1
+        if now["alloc"] > ref["alloc"] * (1 + ALLOC_TOL) and now["alloc"] - ref["alloc"] > ALLOC_SLACK:
+            print("REGRESSION %s: %d B/call (baseline %d)" % (name, now["alloc"], ref["alloc"]))
+            regressions += 1
+    return regressions
+
+
+def main(argv):
+    iterations = 200 if "--quick" in argv else 2000
+    results = run(iterations)
+
+    if "--save" in argv:
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(results, f)
+        print("Baseline saved to", BASELINE_FILE)
+        return 0
+
+    try:
+        with open(BASELINE_FILE) as f:
+            baseline = json.load(f)
+    except OSError:
+        print("No baseline yet; run with --save to store one.")
+        return 0
+
+    regressions = compare(results, baseline)
+    print("%d regression(s) against %s" % (regressions, BASELINE_FILE))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,74 @@
+# events.py – interrupt-safe event ring.
+#
+# IRQ handlers only call post(): the event id and ticks_ms go into
+# preallocated arrays, no allocation and no printing. Handling is
+# deferred to drain(), called only from the main loop / housekeeping task,
+# so handlers never interrupt other code (e.g. log._store mid-update).
+# The loop scheduler watches `posted` to cut its sleep short.
+
+from array import array
+
+# Event ids.
+GREEN = 1
+RED = 2
+PIR_RISE = 3
+PIR_FALL = 4
+_MAX_EVENT = 8
+
+SIZE = 32               # Ring capacity (power of two).
+_MASK = SIZE - 1
+
+_ids = array("B", bytes(SIZE))
+_ticks = array("i", bytes(4 * SIZE))    # ticks_ms (30-bit) fits an int32.
+_head = 0               # Next slot post() writes (IRQ side only).
+_tail = 0               # Next slot drain() reads (loop side only).
+
+overflows = 0           # Events dropped because the ring was full.
+posted = 0              # Events accepted (wake-up check for the loop scheduler).
+handled = 0
+
+_handlers = [None] * _MAX_EVENT     # Event id -> list of fn(event, ticks).
+
+
+def subscribe(event, fn):
+    """Call fn(event, ticks_ms) from drain() for every `event`."""
+    if _handlers[event] is None:
+        _handlers[event] = []
+    _handlers[event].append(fn)
+
+
+def post(event, ticks):
+    """Record an event (IRQ-safe: no allocation); drops it if the ring is full."""
+    global _head, overflows, posted
+    nxt = (_head + 1) & _MASK
+    if nxt == _tail:
+        overflows += 1
+        return
+    _ids[_head] = event
+    _ticks[_head] = ticks
+    _head = nxt
+    posted += 1
+
+
+def pending():
+    return (_head - _tail) & _MASK
+
+
+def drain():
+    """Handle queued events in order; returns how many were handled."""
+    global _tail, handled
+    n = 0
+    while _tail != _head:
+        event = _ids[_tail]
+        ticks = _ticks[_tail]
+        _tail = (_tail + 1) & _MASK
+        fns = _handlers[event]
+        if fns:
+            for fn in fns:
+                try:
+                    fn(event, ticks)
+                except Exception as e:
+                    print("Event handler error:", e)
+        n += 1
+    handled += n
+    return n
@@ -0,0 +1,272 @@
+# fixed_core.py
+# Integer-only fuzzy engine: memberships and activations are Q10 fixed
+# point (0..ONE), so inference allocates no floats on the device.
+
+from array import array
+from math import exp
+
+from .membership import shape
+from .fuzzy_core import detect_inference
+
+ONE = 1024              # Membership 1.0 in fixed point.
+_GAUSS_STEPS = 64       # Table entries per sigma.
+_GAUSS_SIGMAS = 4       # Table covers 0..4 sigma, zero beyond.
+_SMALL_INT = 1 << 29    # Keep accumulators below this (no bigint allocation).
+
+# exp(-u^2 / 2) * ONE for u = k / _GAUSS_STEPS.
+_gauss_table = array("H", [int(ONE * exp(-0.5 * (k / _GAUSS_STEPS) ** 2) + 0.5)
+                           for k in range(_GAUSS_SIGMAS * _GAUSS_STEPS + 2)])
+
+
+def _centroid_bound(span, step):
+    """Largest |step * centroid numerator| for an output of this span and step."""
+    n = span // step + 1
+    half = n - (n - 1) // 2
+    return step * ONE * half * (half + 1) // 2
+
+
+def _compile_set(fn):
+    """Integer parameters for a membership function, or None if unknown."""
+    info = shape(fn)
+    if info is None:
+        return None
+    kind, params = info
+    if kind == "linear":
+        return ("linear", tuple((int(x), int(mu * ONE)) for x, mu in params))
+    if kind == "gaussian":
+        c, sigma = params
+        return ("gaussian", (int(c), max(1, int(sigma))))
+    return None
+
+
+def _mu(spec, x):
+    """Integer membership (0..ONE) of integer x."""
+    kind, params = spec
+    if kind == "gaussian":
+        c, sigma = params
+        num = (x - c if x >= c else c - x) * _GAUSS_STEPS
+        k = num // sigma
+        if k >= _GAUSS_SIGMAS * _GAUSS_STEPS:
+            return 0
+        r = num - k * sigma
+        g0 = _gauss_table[k]
+        return g0 - (g0 - _gauss_table[k + 1]) * r // sigma
+
+    # Piecewise-linear: same edge rules as membership.triangular/trapezoidal.
+    if x <= params[0][0] or x >= params[-1][0]:
+        return 0
+    for k in range(len(params) - 1):
+        xa, ya = params[k]
+        xb, yb = params[k + 1]
+        if x <= xb:
+            if xb == xa:
+                return yb
+            return ya + (yb - ya) * (x - xa) // (xb - xa)
+    return 0
+
+
+class FixedFuzzyCore:
+    def __init__(self, input_sets, output_sets, rules, output_ranges,
+                 sample_steps=None, inference=None):
+        """
+        Same configuration as FuzzyCore; sets must come from membership.py.
+        sample_steps: {out_var: step} for the output domain (default 1).
+        inference: "mamdani" or "sugeno"; default detected from the rules.
+        compute() returns a dict of ints that is reused between calls.
+        """
+        self.output_ranges = output_ranges
+        self.inference = inference or detect_inference(rules)
+        steps = sample_steps or {}
+
+        # Inputs: (var, [spec per label], mu buffer), label slot order.
+        self._inputs = []
+        slots = {}
+        for var, sets in input_sets.items():
+            specs = []
+            slots[var] = {}
+            for label, fn in sets.items():
+                spec = _compile_set(fn)
+                if spec is None:
+                    print(f"Fixed core: no shape for {var}-{label}; treated as zero.")
+                slots[var][label] = len(specs)
+                specs.append(spec)
+            self._inputs.append((var, specs, array("H", bytes(2 * len(specs)))))
+        mu_bufs = {var: buf for var, _, buf in self._inputs}
+
+        # Outputs: (var, min, step, [mu arrays], activation buffer, mid).
+        # The centroid sums index offsets from the middle sample (mid); a
+        # grid too fine for those sums to stay in small ints is coarsened.
+        self._outputs = []
+        out_slots = {}
+        if self.inference != "sugeno":
+            for out_var, sets in output_sets.items():
+                out_min, out_max = output_ranges[out_var]
+                step = asked = max(1, int(steps.get(out_var, 1)))
+                while _centroid_bound(out_max - out_min, step) >= _SMALL_INT:
+                    step += 1
+                if step != asked:
+                    print(f"Fixed core: {out_var} sample step raised to {step}.")
+                n = (out_max - out_min) // step + 1
+                mid = (n - 1) // 2
+                curves = []
+                out_slots[out_var] = {}
+                for label, fn in sets.items():
+                    spec = _compile_set(fn)
+                    mu = array("H", bytes(2 * n))
+                    if spec is None:
+                        print(f"Fixed core: no shape for {out_var}-{label}; treated as zero.")
+                    else:
+                        for i in range(n):
+                            mu[i] = _mu(spec, out_min + i * step)
+                    out_slots[out_var][label] = len(curves)
+                    curves.append(mu)
+                self._outputs.append((out_var, out_min, step, curves,
+                                      array("H", bytes(2 * len(curves))), mid))
+        act_bufs = {out[0]: out[4] for out in self._outputs}
+
+        # Rules: (((mu buffer, slot), ...), consequents).
+        # Mamdani consequent: (activation buffer, slot).
+        # Sugeno consequent: (out index, bias, ((input index, coef in Q10), ...)).
+        out_names = list(output_ranges)
+        in_names = [var for var, _, _ in self._inputs]
+        self._rules = []
+        for rule in rules:
+            try:
+                conds = tuple((mu_bufs[var], slots[var][label])
+                              for var, label in rule.get("if", {}).items())
+            except KeyError as e:
+                print("Fixed core: unknown rule antecedent:", e)
+                continue
+            if not conds:
+                continue
+
+            outs = []
+            for out_var, cons in rule.get("then", {}).items():
+                if self.inference == "sugeno":
+                    if out_var not in output_ranges:
+                        continue
+                    if isinstance(cons, dict):
+                        terms = tuple((in_names.index(var), int(coef * ONE))
+                                      for var, coef in cons.items() if var != "bias")
+                        outs.append((out_names.index(out_var), int(cons.get("bias", 0)), terms))
+                    else:
+                        outs.append((out_names.index(out_var), int(cons), ()))
+                elif out_var in act_bufs and cons in out_slots[out_var]:
+                    outs.append((act_bufs[out_var], out_slots[out_var][cons]))
+            self._rules.append((conds, tuple(outs)))
+
+        # Sugeno accumulators and raw input values, one slot each.
+        self._values = [0] * len(in_names)
+        self._sums = [0] * len(out_names)
+        self._weights = [0] * len(out_names)
+        self._out_names = out_names
+        self._result = {out_var: output_ranges[out_var][0] for out_var in out_names}
+
+    # ---------- Fuzzification ----------
+    def fuzzify(self, inputs):
+        """Fill each input's Q10 membership buffer (zeros for missing inputs)."""
+        values = self._values
+        for i in range(len(self._inputs)):
+            var, specs, buf = self._inputs[i]
+            value = inputs.get(var)
+            if value is None:
+                for j in range(len(buf)):
+                    buf[j] = 0
+                values[i] = 0
+                continue
+            x = int(value)
+            values[i] = x
+            for j in range(len(buf)):
+                spec = specs[j]
+                buf[j] = _mu(spec, x) if spec is not None else 0
+
+    # ---------- Full Pipeline ----------
+    def compute(self, inputs):
+        """
+        inputs: {"distance": 120}
+        returns: {"duty": 42, "freq": 900} (integers, reused dict)
+        """
+        result = self._result
+        try:
+            self.fuzzify(inputs)
+            if self.inference == "sugeno":
+                self._sugeno()
+            else:
+                self._mamdani()
+        except Exception as e:
+            print("Fixed compute error:", e)
+            for out_var in self._out_names:
+                result[out_var] = self.output_ranges[out_var][0]
+        return result
+
+    def _strength(self, conds):
+        w = ONE
+        for buf, slot in conds:
+            m = buf[slot]
+            if m < w:
+                w = m
+        return w
+
+    def _mamdani(self):
+        for out in self._outputs:
+            acts = out[4]
+            for j in range(len(acts)):
+                acts[j] = 0
+
+        for conds, outs in self._rules:
+            w = self._strength(conds)
+            if w == 0:
+                continue
+            for acts, slot in outs:
+                if w > acts[slot]:
+                    acts[slot] = w
+
+        # Clipped max, centroid in domain-index units from the middle sample.
+        result = self._result
+        for out_var, out_min, step, curves, acts, mid in self._outputs:
+            num = 0
+            den = 0
+            for i in range(len(curves[0]) if curves else 0):
+                best = 0
+                for j in range(len(curves)):
+                    m = curves[j][i]
+                    a = acts[j]
+                    if a < m:
+                        m = a
+                    if m > best:
+                        best = m
+                num += (i - mid) * best
+                den += best
+            if den:
+                result[out_var] = out_min + step * mid + (step * num + den // 2) // den
+            else:
+                result[out_var] = out_min
+
+    def _sugeno(self):
+        sums = self._sums
+        weights = self._weights
+        values = self._values
+        for k in range(len(sums)):
+            sums[k] = 0
+            weights[k] = 0
+
+        for conds, outs in self._rules:
+            w = self._strength(conds)
+            if w == 0:
+                continue
+            for k, bias, terms in outs:
+                z = bias
+                for i, coef in terms:
+                    z += coef * values[i] // ONE
+                sums[k] += w * z
+                weights[k] += w
+
+        result = self._result
+        for k in range(len(sums)):
+            out_var = self._out_names[k]
+            out_min, out_max = self.output_ranges[out_var]
+            if weights[k]:
+                z = sums[k] // weights[k]
+                result[out_var] = out_min if z < out_min else out_max if z > out_max else z
+            else:
+                result[out_var] = out_min
@@ -40,14 +40,50 @@ output_ranges = {
     "freq": (100, 2000)
 }
 
-# Rules using 4 distance memberships.
-rules = [
+# Inference: "mamdani" (output sets + centroid) or "sugeno" (TSK: constant
+# or linear consequents, firing-strength weighted average).
+inference = "mamdani"
+
+# Mamdani rules using 4 distance memberships.
+mamdani_rules = [
     {"if": {"distance": "very_close"}, "then": {"freq": "high", "duty": "high"}},
     {"if": {"distance": "close"},      "then": {"freq": "high", "duty": "medium"}},
     {"if": {"distance": "medium"},     "then": {"freq": "medium", "duty": "low"}},
     {"if": {"distance": "far"},        "then": {"freq": "low", "duty": "low"}}
 ]
 
+# Sugeno rules: a number is a constant output, a dict is
+# bias + sum(coef * input). Output sets are not used.
+sugeno_rules = [
+    {"if": {"distance": "very_close"}, "then": {"freq": 1700, "duty": 85}},
+    {"if": {"distance": "close"},      "then": {"freq": {"bias": 2000, "distance": -0.6}, "duty": 50}},
+    {"if": {"distance": "medium"},     "then": {"freq": 1000, "duty": 20}},
+    {"if": {"distance": "far"},        "then": {"freq": 400, "duty": 15}}
+]
+
+rules = sugeno_rules if inference == "sugeno" else mamdani_rules
+
+# Defuzzification per output: "analytic" (exact centroid, piecewise-linear
+# sets only) or "sampled" (numeric centroid with the given domain step).
+defuzz_methods = {
+    "duty": "analytic",
+    "freq": "sampled"
+}
+sample_steps = {
+    "freq": 10
+}
+
+# Lookup table resolution (mm between samples); None = exact pipeline only.
+lut_step = 20
+# mm between table error checks (None = skip). Checking every mm costs one
+# exact compute per mm, seconds at boot on the Pico; test.py does it on the host.
+lut_check = None
+
+# Result cache: max entries (0 = off) and input bucket size in mm.
+# Mostly useful without the lookup table, or with several inputs.
+cache_size = 0
+cache_bucket = 5
+
 # ======================
 # Sanity check (optional)
 # ======================
@@ -58,12 +94,24 @@ try:
             if var not in input_sets:
                 print(f"Warning: Rule references unknown input '{var}'.")
 
-    # Ensure output labels in rules match output_sets.
+    # Ensure output labels (Mamdani) or coefficients (Sugeno) in rules are known.
     for rule in rules:
         for out_var, out_label in rule["then"].items():
-            if out_var not in output_sets or out_label not in output_sets[out_var]:
+            if inference == "sugeno":
+                if out_var not in output_ranges:
+                    print(f"Warning: Rule output '{out_var}' has no range.")
+                if isinstance(out_label, dict):
+                    for var in out_label:
+                        if var != "bias" and var not in input_sets:
+                            print(f"Warning: Rule output '{out_var}' uses unknown input '{var}'.")
+            elif out_var not in output_sets or out_label not in output_sets[out_var]:
                 print(f"Warning: Rule output '{out_var}:{out_label}' not defined in output_sets.")
 
+    # Ensure defuzzify settings name real outputs.
+    for out_var in list(defuzz_methods) + list(sample_steps):
+        if out_var not in output_sets:
+            print(f"Warning: Defuzzify setting for unknown output '{out_var}'.")
+
     # Ensure ranges align with outputs.
     for out_var in output_sets:
         if out_var not in output_ranges:
@@ -1,16 +1,378 @@
+from array import array
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ucollections import OrderedDict
+
+from .membership import shape
+
+
+def detect_inference(rules):
+    """"sugeno" if any rule consequent is not a label, else "mamdani"."""
+    for rule in rules:
+        for cons in rule.get("then", {}).values():
+            if not isinstance(cons, str):
+                return "sugeno"
+    return "mamdani"
+
+
+# ---------- Exact centroid helpers ----------
+def _line_at(points, x0, x1):
+    """
+    Values at x0 and x1 of the piecewise-linear shape `points`,
+    assuming [x0, x1] lies inside a single segment (or outside the shape).
+    """
+    xm = (x0 + x1) / 2
+    if xm <= points[0][0] or xm >= points[-1][0]:
+        return 0.0, 0.0
+    for k in range(len(points) - 1):
+        xa, ya = points[k]
+        xb, yb = points[k + 1]
+        if xa <= xm <= xb:
+            slope = (yb - ya) / (xb - xa)
+            return ya + slope * (x0 - xa), ya + slope * (x1 - xa)
+    return 0.0, 0.0
+
+
+def _linear_centroid(curves, lo, hi):
+    """
+    Exact centroid of max_j(min(a_j, shape_j(x))) over [lo, hi].
+    curves: [(points, a), ...] with points as piecewise-linear breakpoints.
+    Returns (moment, area).
+    """
+    # Breakpoints: domain ends, shape vertices and clip-level crossings.
+    xs = [lo, hi]
+    for points, a in curves:
+        for k in range(len(points)):
+            xs.append(points[k][0])
+            if k + 1 < len(points):
+                xa, ya = points[k]
+                xb, yb = points[k + 1]
+                if (ya - a) * (yb - a) < 0:
+                    xs.append(xa + (a - ya) * (xb - xa) / (yb - ya))
+    xs = sorted(set(x for x in xs if lo <= x <= hi))
+
+    moment = 0.0
+    area = 0.0
+    for i in range(len(xs) - 1):
+        x0, x1 = xs[i], xs[i + 1]
+        if x1 <= x0:
+            continue
+
+        # Every clipped curve is linear on [x0, x1].
+        lines = []
+        for points, a in curves:
+            y0, y1 = _line_at(points, x0, x1)
+            lines.append((min(a, y0), min(a, y1)))
+
+        # Split where the upper envelope switches curve.
+        ts = [0.0, 1.0]
+        for p in range(len(lines)):
+            for q in range(p + 1, len(lines)):
+                d0 = lines[p][0] - lines[q][0]
+                d1 = lines[p][1] - lines[q][1]
+                if d0 * d1 < 0:
+                    ts.append(d0 / (d0 - d1))
+        ts.sort()
+
+        for j in range(len(ts) - 1):
+            t0, t1 = ts[j], ts[j + 1]
+            g0 = max(y0 + (y1 - y0) * t0 for y0, y1 in lines)
+            g1 = max(y0 + (y1 - y0) * t1 for y0, y1 in lines)
+            u0 = x0 + (x1 - x0) * t0
+            u1 = x0 + (x1 - x0) * t1
+            width = u1 - u0
+            area += width * (g0 + g1) / 2
+            moment += width * (u0 * (2 * g0 + g1) + u1 * (g0 + 2 * g1)) / 6
+
+    return moment, area
+
+
 class FuzzyCore:
-    def __init__(self, input_sets, output_sets, rules, output_ranges):
+    def __init__(self, input_sets, output_sets, rules, output_ranges,
+                 lut_range=None, lut_step=10, lut_check=1,
+                 defuzz_methods=None, sample_steps=None, inference=None,
+                 epsilon=1e-4, cache_size=0, cache_bucket=1):
         """
         input_sets: dict.
         output_sets: dict.
         rules: list of dict.
         output_ranges: dict; crisp output ranges
+        lut_range: (lo, hi) input range to compile into a lookup table,
+                   or None for the exact pipeline only (single input only).
+        lut_step: input distance between table samples.
+        lut_check: input distance between the points where the table
+                   error is measured (1 = every whole mm, what the sensor
+                   reports); None skips the measurement.
+        defuzz_methods: {out_var: "analytic" | "sampled"}; default is
+                        analytic wherever all sets are piecewise-linear.
+        sample_steps: {out_var: step} for sampled outputs (default 1).
+        inference: "mamdani" or "sugeno"; default detects Sugeno from
+                   non-label rule consequents (numbers or {"bias", input: coef}).
+        epsilon: memberships at or below this count as zero; rules that
+                 depend on them are skipped.
+        cache_size: max cached results (LRU); 0 disables the cache.
+        cache_bucket: input quantization for cache keys, an int or
+                      {input var: bucket}.
         """
         self.input_sets = input_sets
         self.output_sets = output_sets
         self.rules = rules
         self.output_ranges = output_ranges
 
+        self.inference = inference or detect_inference(rules)
+        self.epsilon = epsilon
+
+        # Sugeno consequents compiled once (see _compile_sugeno).
+        self._sugeno = []
+        if self.inference == "sugeno":
+            self._compile_sugeno()
+
+        # Rule index compiled once (see _compile_rules).
+        self._index = {}          # {input var: {label: [rule ids]}}.
+        self._activations = {}    # Reused Mamdani activations.
+        self._rule_outs = []      # Per rule: ((activation dict, label), ...).
+        self._compile_rules()
+
+        # Output sets prepared once (see _prepare_outputs).
+        self._out_lines = {}  # {out_var: [(label, breakpoints), ...]} analytic.
+        self._out_x = {}      # {out_var: array of domain points} sampled.
+        self._out_sets = {}   # {out_var: [(label, mu array, x*mu array), ...]}.
+        self._out_act = {}    # {out_var: activation buffer, one slot per label}.
+        if self.inference != "sugeno":
+            self._prepare_outputs(defuzz_methods or {}, sample_steps or {})
+
+        # Lookup-table state (see compile_table).
+        self._lut = None
+        self._lut_var = None
+        self._lut_lo = 0
+        self._lut_step = 1
+        self._lut_n = 0
+        self.lut_error = None   # {out_var: max abs error vs exact path}.
+
+        if lut_range is not None:
+            self.compile_table(lut_range, lut_step, lut_check)
+
+        # Result cache keyed by quantized inputs (see compute).
+        self._cache = OrderedDict() if cache_size > 0 else None
+        self._cache_size = cache_size
+        self._cache_keys = [(var, cache_bucket.get(var, 1) if isinstance(cache_bucket, dict)
+                             else cache_bucket) for var in input_sets]
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    # ---------- Sugeno consequents ----------
+    def _compile_sugeno(self):
+        """
+        Turn each rule's "then" into (out_var, bias, ((input, coef), ...)):
+        a number is a constant, a dict is bias + sum(coef * input).
+        """
+        for rule in self.rules:
+            outs = []
+            for out_var, cons in rule.get("then", {}).items():
+                try:
+                    if isinstance(cons, dict):
+                        terms = tuple((var, coef) for var, coef in cons.items() if var != "bias")
+                        outs.append((out_var, cons.get("bias", 0), terms))
+                    else:
+                        outs.append((out_var, float(cons), ()))
+                except Exception as e:
+                    print(f"Sugeno consequent error on {out_var}:", e)
+            self._sugeno.append(outs)
+
+    # ---------- Rule index ----------
+    def _compile_rules(self):
+        """
+        Index rules by (input var, label) so only rules whose antecedents
+        all have non-zero membership are visited, and resolve Mamdani
+        output slots to the reused activation dicts.
+        """
+        n = len(self.rules)
+        self._need = array("B", bytes(n))       # Antecedent count per rule.
+        self._hits = array("B", bytes(n))       # Non-zero antecedents seen.
+        self._strength = array("f", bytes(4 * n))
+        self._touched = array("H", bytes(2 * n))
+        self._fired = array("H", bytes(2 * n))
+
+        if self.inference != "sugeno":
+            self._activations = {out: {label: 0.0 for label in sets}
+                                 for out, sets in self.output_sets.items()}
+
+        for r, rule in enumerate(self.rules):
+            conditions = rule.get("if", {})
+            self._need[r] = len(conditions)
+            for var, label in conditions.items():
+                self._index.setdefault(var, {}).setdefault(label, []).append(r)
+
+            slots = []
+            if self.inference != "sugeno":
+                for out_var, out_label in rule.get("then", {}).items():
+                    acts = self._activations.get(out_var)
+                    if acts is not None and out_label in acts:
+                        slots.append((acts, out_label))
+            self._rule_outs.append(tuple(slots))
+
+    def _fire(self, fuzzified):
+        """
+        Fill self._fired / self._strength with the rules whose antecedents
+        are all above epsilon. Returns the number of fired rules.
+        """
+        hits = self._hits
+        need = self._need
+        strength = self._strength
+        touched = self._touched
+        fired = self._fired
+        eps = self.epsilon
+        n_touched = 0
+        n_fired = 0
+
+        for var, mus in fuzzified.items():
+            by_label = self._index.get(var)
+            if by_label is None:
+                continue
+            for label, mu in mus.items():
+                if mu <= eps:
+                    continue
+                ids = by_label.get(label)
+                if ids is None:
+                    continue
+                for r in ids:
+                    h = hits[r]
+                    if h == 0:
+                        touched[n_touched] = r
+                        n_touched += 1
+                        strength[r] = mu
+                    elif mu < strength[r]:
+                        strength[r] = mu
+                    h += 1
+                    hits[r] = h
+                    if h == need[r]:
+                        fired[n_fired] = r
+                        n_fired += 1
+
+        for i in range(n_touched):
+            hits[touched[i]] = 0
+        return n_fired
+
+    # ---------- Output preparation ----------
+    def _prepare_outputs(self, methods, steps):
+        """
+        Per output variable, either keep the breakpoints for the exact
+        centroid, or sample every set over its domain once so
+        defuzzification only clips and sums preallocated arrays.
+        """
+        for out_var, sets in self.output_sets.items():
+            method = methods.get(out_var, "analytic")
+            if method == "analytic":
+                lines = []
+                for label, fn in sets.items():
+                    info = shape(fn)
+                    if info is None or info[0] != "linear":
+                        break
+                    lines.append((label, info[1]))
+                else:
+                    self._out_lines[out_var] = lines
+                    self._out_act[out_var] = array("f", bytes(4 * len(lines)))
+                    continue
+                if out_var in methods:
+                    print(f"Analytic defuzzify needs linear sets on {out_var}; sampling.")
+            elif method != "sampled":
+                print(f"Unknown defuzzify method on {out_var}:", method)
+
+            try:
+                out_min, out_max = self.output_ranges[out_var]
+                step = steps.get(out_var, 1)
+                xs = array("f", range(out_min, out_max + 1, step))
+                n = len(xs)
+
+                curves = []
+                for label, fn in sets.items():
+                    mu = array("f", bytes(4 * n))
+                    xmu = array("f", bytes(4 * n))
+                    for i in range(n):
+                        try:
+                            mu[i] = fn(xs[i])
+                        except Exception as e:
+                            print(f"Output sampling error on {out_var}-{label}:", e)
+                            mu[i] = 0.0
+                        xmu[i] = xs[i] * mu[i]
+                    curves.append((label, mu, xmu))
+
+                self._out_x[out_var] = xs
+                self._out_sets[out_var] = curves
+                self._out_act[out_var] = array("f", bytes(4 * len(curves)))
+            except Exception as e:
+                print(f"Output sampling error on {out_var}:", e)
+
+    # ---------- Lookup table ----------
+    def compile_table(self, lut_range, step=10, check=1):
+        """
+        Sample the single-input control surface over lut_range into
+        one float array per output; compute() then interpolates.
+        Unless check is None, also compares the table with the exact
+        path every `check` across the range and stores the worst
+        error in self.lut_error. (Sampled outputs are not smooth, so
+        midpoints alone can miss the worst case.)
+        """
+        self._lut = None
+        self.lut_error = None
+        try:
+            if len(self.input_sets) != 1:
+                print("Lookup table needs exactly one input variable.")
+                return False
+
+            var = next(iter(self.input_sets))
+            lo, hi = lut_range
+            step = max(1, step)
+            n = (hi - lo + step - 1) // step + 1   # last sample >= hi.
+
+            tables = {out_var: array("f", bytes(4 * n)) for out_var in self.output_sets}
+            for i in range(n):
+                out = self._compute_exact({var: lo + i * step})
+                for out_var, table in tables.items():
+                    table[i] = out[out_var]
+
+            self._lut_var = var
+            self._lut_lo = lo
+            self._lut_step = step
+            self._lut_n = n
+            self._lut = tables
+
+            if check is None:
+                return True
+            errors = {out_var: 0.0 for out_var in tables}
+            for x in range(lo, hi + 1, max(1, check)):
+                exact = self._compute_exact({var: x})
+                approx = self._interpolate(x)
+                for out_var in errors:
+                    err = abs(exact[out_var] - approx[out_var])
+                    if err > errors[out_var]:
+                        errors[out_var] = err
+            self.lut_error = errors
+            return True
+
+        except Exception as e:
+            print("Lookup table compile error:", e)
+            self._lut = None
+            return False
+
+    def _interpolate(self, value):
+        """Linear interpolation in the compiled table (input clamped)."""
+        if self._lut_n < 2:
+            return {out_var: table[0] for out_var, table in self._lut.items()}
+        pos = (value - self._lut_lo) / self._lut_step
+        if pos <= 0:
+            i, frac = 0, 0.0
+        else:
+            i = int(pos)
+            if i >= self._lut_n - 1:
+                i, frac = self._lut_n - 2, 1.0
+            else:
+                frac = pos - i
+        return {out_var: table[i] + (table[i + 1] - table[i]) * frac
+                for out_var, table in self._lut.items()}
+
     # ---------- Fuzzification ----------
     def fuzzify(self, inputs):
         """
@@ -48,29 +410,24 @@ class FuzzyCore:
         """
         Returns activations for each output variable's fuzzy sets
         Example: {"pwm": {"high": 0.7, "low": 0.2}, "servo": {"left": 0.5}}
+        The returned dict is reused by the next call.
         """
         try:
-            # Initialize all outputs with 0 activation.
-            activations = {out: {label: 0.0 for label in sets}
-                           for out, sets in self.output_sets.items()}
-
-            # Evaluate each rule.
-            for rule in self.rules:
-                conditions = rule.get("if", {})
-                try:
-                    values = [fuzzified[var][label] for var, label in conditions.items()]
-                except KeyError as e:
-                    print("Missing fuzzified value in rule:", e)
-                    continue
-
-                rule_strength = min(values) if values else 0.0
+            # Reset the reused activations.
+            activations = self._activations
+            for acts in activations.values():
+                for label in acts:
+                    acts[label] = 0.0
 
-                # Apply to all outputs defined in "then".
-                for out_var, out_label in rule.get("then", {}).items():
-                    if out_var in activations and out_label in activations[out_var]:
-                        activations[out_var][out_label] = max(
-                            activations[out_var][out_label], rule_strength
-                        )
+            # Visit only rules that fired.
+            strength = self._strength
+            fired = self._fired
+            for i in range(self._fire(fuzzified)):
+                r = fired[i]
+                rule_strength = strength[r]
+                for acts, out_label in self._rule_outs[r]:
+                    if rule_strength > acts[out_label]:
+                        acts[out_label] = rule_strength
 
             return activations
 
@@ -84,33 +441,53 @@ class FuzzyCore:
     def aggregate_and_defuzzify(self, activations):
         """
         For each output variable:
-          - Build aggregated membership across domain.
-          - Defuzzify via centroid.
+          - Analytic: exact centroid of the clipped piecewise-linear sets.
+          - Sampled: clip the pre-sampled sets by their activations,
+            take the max and sum the centroid over the domain.
         Returns crisp outputs: {"pwm": value, "servo": value}.
         """
         crisp_outputs = {}
         try:
-            for out_var, sets in self.output_sets.items():
+            for out_var, lines in self._out_lines.items():
                 out_min, out_max = self.output_ranges[out_var]
-                step = 1 if out_var == 'duty' else 10
-                domain = list(range(out_min, out_max + 1, step))
-
-                aggregated = []
-                for x in domain:
-                    # For each label in this output variable.
-                    memberships = []
-                    for label, fn in sets.items():
-                        try:
-                            memberships.append(min(activations[out_var][label], fn(x)))
-                        except Exception as e:
-                            print(f"Defuzzify membership error on {out_var}-{label}:", e)
-                            memberships.append(0.0)
-                    aggregated.append(max(memberships))
+                active = []
+                for label, points in lines:
+                    a = activations[out_var][label]
+                    if a > 0.0:
+                        active.append((points, a))
+                moment, area = _linear_centroid(active, out_min, out_max)
+                crisp_outputs[out_var] = moment / (area or 1.0)
 
-                # Defuzzify centroid.
-                numerator = sum(x * mu for x, mu in zip(domain, aggregated))
-                denominator = sum(aggregated) or 1.0
-                crisp_outputs[out_var] = numerator / denominator
+            for out_var, curves in self._out_sets.items():
+                xs = self._out_x[out_var]
+                acts = self._out_act[out_var]
+                k = len(curves)
+                for j in range(k):
+                    acts[j] = activations[out_var][curves[j][0]]
+
+                # Clipped max over labels, summed straight into the centroid.
+                numerator = 0.0
+                denominator = 0.0
+                for i in range(len(xs)):
+                    best = 0.0
+                    weight = 0.0
+                    for j in range(k):
+                        a = acts[j]
+                        if a <= 0.0:
+                            continue
+                        _, mu, xmu = curves[j]
+                        m = mu[i]
+                        if m > a:
+                            if a > best:
+                                best = a
+                                weight = a * xs[i]
+                        elif m > best:
+                            best = m
+                            weight = xmu[i]
+                    numerator += weight
+                    denominator += best
+
+                crisp_outputs[out_var] = numerator / (denominator or 1.0)
 
         except Exception as e:
             print("Defuzzify stage error:", e)
@@ -119,10 +496,83 @@ class FuzzyCore:
 
         return crisp_outputs
 
+    # ---------- Sugeno (TSK) inference ----------
+    def sugeno_outputs(self, fuzzified, inputs):
+        """
+        Weighted average of rule consequents by firing strength.
+        Returns crisp outputs clamped to output_ranges.
+        """
+        sums = {out_var: 0.0 for out_var in self.output_ranges}
+        weights = {out_var: 0.0 for out_var in self.output_ranges}
+        try:
+            strength = self._strength
+            fired = self._fired
+            for i in range(self._fire(fuzzified)):
+                r = fired[i]
+                w = strength[r]
+                for out_var, bias, terms in self._sugeno[r]:
+                    if out_var not in sums:
+                        continue
+                    z = bias
+                    for var, coef in terms:
+                        z += coef * inputs[var]
+                    sums[out_var] += w * z
+                    weights[out_var] += w
+
+        except Exception as e:
+            print("Sugeno stage error:", e)
+
+        crisp_outputs = {}
+        for out_var, (out_min, out_max) in self.output_ranges.items():
+            if weights[out_var] > 0.0:
+                crisp_outputs[out_var] = min(max(sums[out_var] / weights[out_var], out_min), out_max)
+            else:
+                crisp_outputs[out_var] = out_min
+        return crisp_outputs
+
     # ---------- Full Pipeline ----------
     def compute(self, inputs):
+        """
+        inputs: {"distance": 120}
+        returns: {"duty": 42.0, "freq": 900.0}
+        Served from the cache when enabled (treat the result as read-only),
+        else from the lookup table when compiled, else the exact pipeline.
+        """
+        cache = self._cache
+        if cache is None:
+            return self._compute(inputs)
+
+        key = tuple(None if inputs.get(var) is None else int(inputs[var] // bucket)
+                    for var, bucket in self._cache_keys)
+        out = cache.pop(key, None)
+        if out is not None:
+            self.cache_hits += 1
+            cache[key] = out            # Most recently used goes last.
+            return out
+
+        self.cache_misses += 1
+        out = self._compute(inputs)
+        if len(cache) >= self._cache_size:
+            del cache[next(iter(cache))]    # Evict least recently used.
+        cache[key] = out
+        return out
+
+    def _compute(self, inputs):
+        if self._lut is not None and len(inputs) == 1:
+            value = inputs.get(self._lut_var)
+            if value is not None:
+                try:
+                    return self._interpolate(value)
+                except Exception as e:
+                    print("Lookup table error:", e)
+        return self._compute_exact(inputs)
+
+    def _compute_exact(self, inputs):
         try:
             fuzzified = self.fuzzify(inputs)
+            if self.inference == "sugeno":
+                return self.sugeno_outputs(fuzzified, inputs)
+
             activations = self.apply_rules(fuzzified)
 
             # If no rules fired, return minimum safe outputs.
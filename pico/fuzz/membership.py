@@ -1,6 +1,16 @@
 # membership.py
 # Provides standard membership function generators for fuzzy sets.
 
+# Shape parameters of every generated function, keyed by the function
+# itself, so engines can use the exact geometry instead of sampling:
+#   ("linear", ((x, mu), ...))  - piecewise-linear breakpoints.
+#   ("gaussian", (c, sigma)).
+_shapes = {}
+
+def shape(fn):
+    """Return the registered shape of a membership function, or None."""
+    return _shapes.get(fn)
+
 def triangular(a, b, c):
     """
     Triangular membership function.
@@ -20,6 +30,7 @@ def triangular(a, b, c):
         except Exception as e:
             print("Triangular membership error:", e)
             return 0.0
+    _shapes[fn] = ("linear", ((a, 0.0), (b, 1.0), (c, 0.0)))
     return fn
 
 def trapezoidal(a, b, c, d):
@@ -41,6 +52,7 @@ def trapezoidal(a, b, c, d):
         except Exception as e:
             print("Trapezoidal membership error:", e)
             return 0.0
+    _shapes[fn] = ("linear", ((a, 0.0), (b, 1.0), (c, 1.0), (d, 0.0)))
     return fn
 
 def gaussian(c, sigma):
@@ -56,4 +68,5 @@ def gaussian(c, sigma):
         except Exception as e:
             print("Gaussian membership error:", e)
             return 0.0
+    _shapes[fn] = ("gaussian", (c, sigma))
     return fn
@@ -0,0 +1,162 @@
+# input/filters.py
+# Streaming distance filters: one new reading per call, fixed
+# preallocated ring buffers, velocity from the filtered history.
+
+from array import array
+from time import ticks_ms, ticks_diff
+
+
+class _StreamFilter:
+    """
+    Base for the streaming filters. Subclasses implement
+    _step(reading) -> float: take one valid raw reading in mm (never None)
+    and return the new filtered estimate. update() rounds it, records the
+    history and handles missing readings; reset() must also clear any
+    subclass state (override it and call super().reset()).
+    """
+
+    def __init__(self, history=5, max_misses=3):
+        """
+        history: filtered samples kept for the velocity estimate.
+        max_misses: consecutive None readings before the filter resets.
+        """
+        self.history = max(2, history)
+        self.max_misses = max_misses
+        self._hist = array("i", bytes(4 * self.history))   # Filtered mm.
+        self._times = array("i", bytes(4 * self.history))  # ticks_ms.
+        self._head = 0
+        self._count = 0
+        self._misses = 0
+        self.value = None
+
+    def reset(self):
+        self._head = 0
+        self._count = 0
+        self._misses = 0
+        self.value = None
+
+    def update(self, reading, now=None):
+        """
+        Feed one raw reading (mm or None); return the filtered distance.
+        Missing readings hold the last value until max_misses in a row.
+        """
+        if reading is None:
+            self._misses += 1
+            if self._misses >= self.max_misses:
+                self.reset()
+            return self.value
+
+        self._misses = 0
+        self.value = int(self._step(reading) + 0.5)
+        self._hist[self._head] = self.value
+        self._times[self._head] = ticks_ms() if now is None else now
+        self._head = (self._head + 1) % self.history
+        if self._count < self.history:
+            self._count += 1
+        return self.value
+
+    def velocity(self):
+        """Filtered rate of change in mm/s (negative = approaching)."""
+        if self._count < 2:
+            return 0
+        newest = (self._head - 1) % self.history
+        oldest = (self._head - self._count) % self.history
+        dt = ticks_diff(self._times[newest], self._times[oldest])
+        if dt <= 0:
+            return 0
+        return (self._hist[newest] - self._hist[oldest]) * 1000 // dt
+
+
+class MedianFilter(_StreamFilter):
+    def __init__(self, size=5, history=5, max_misses=3):
+        """Running median over the last `size` readings (outlier rejection)."""
+        super().__init__(history, max_misses)
+        self.size = max(1, size)
+        self._ring = array("i", bytes(4 * self.size))     # Arrival order.
+        self._sorted = array("i", bytes(4 * self.size))   # Same values, sorted.
+        self._pos = 0
+        self._n = 0
+
+    def reset(self):
+        super().reset()
+        self._pos = 0
+        self._n = 0
+
+    def _step(self, reading):
+        srt = self._sorted
+        n = self._n
+
+        # Drop the value leaving the window from the sorted copy.
+        if n == self.size:
+            old = self._ring[self._pos]
+            i = 0
+            while srt[i] != old:
+                i += 1
+            while i < n - 1:
+                srt[i] = srt[i + 1]
+                i += 1
+            n -= 1
+
+        # Insert the new value in order.
+        i = n
+        while i > 0 and srt[i - 1] > reading:
+            srt[i] = srt[i - 1]
+            i -= 1
+        srt[i] = reading
+        n += 1
+
+        self._ring[self._pos] = reading
+        self._pos = (self._pos + 1) % self.size
+        self._n = n
+        if n % 2:
+            return srt[n // 2]
+        return (srt[n // 2 - 1] + srt[n // 2]) / 2
+
+
+class EMAFilter(_StreamFilter):
+    def __init__(self, alpha=0.3, history=5, max_misses=3):
+        """Exponential moving average; alpha in (0, 1], higher = faster."""
+        super().__init__(history, max_misses)
+        self.alpha = alpha
+        self._ema = None
+
+    def reset(self):
+        super().reset()
+        self._ema = None
+
+    def _step(self, reading):
+        if self._ema is None:
+            self._ema = float(reading)
+        else:
+            self._ema += self.alpha * (reading - self._ema)
+        return self._ema
+
+
+class KalmanFilter(_StreamFilter):
+    def __init__(self, process_var=50.0, measure_var=400.0, history=5, max_misses=3):
+        """
+        1-D Kalman filter on distance (random-walk model).
+        process_var: expected change per reading (mm^2).
+        measure_var: sensor noise (mm^2).
+        """
+        super().__init__(history, max_misses)
+        self.q = process_var
+        self.r = measure_var
+        self._x = None
+        self._p = measure_var
+
+    def reset(self):
+        super().reset()
+        self._x = None
+        self._p = self.r
+
+    def _step(self, reading):
+        if self._x is None:
+            self._x = float(reading)
+            self._p = self.r
+            return self._x
+        p = self._p + self.q
+        k = p / (p + self.r)
+        self._x += k * (reading - self._x)
+        self._p = (1 - k) * p
+        return self._x
@@ -2,19 +2,78 @@
 from time import ticks_ms, ticks_diff
 
 class MotionDistanceManager:
-    def __init__(self, pir_sensor, distance_sensor, active_ms=60000):
+    def __init__(self, pir_sensor, distance_sensor, active_ms=60000,
+                 min_period_ms=50, max_period_ms=250,
+                 near_mm=500, far_mm=2000, fast_mm_s=400):
         # PIR and distance sensor objects.
         self.pir = pir_sensor
         self.distance = distance_sensor
         self.active_ms = active_ms
         self.state = "IDLE"
         self.last_motion = 0  # last time PIR was HIGH.
+        self._edge_ms = 0     # Latest PIR rising edge not yet seen by update().
+        self._edge = False
+
+        # Adaptive sampling: period_ms shrinks towards min_period_ms as the
+        # target gets closer than far_mm (min at near_mm) or moves faster
+        # (min at fast_mm_s), and sits at max_period_ms when IDLE/static.
+        self.min_period_ms = min_period_ms
+        self.max_period_ms = max_period_ms
+        self.near_mm = near_mm
+        self.far_mm = far_mm
+        self.fast_mm_s = fast_mm_s
+        self.period_ms = max_period_ms
+        self._last_dist = None
+        self._last_dist_ms = 0
+
+    def on_motion(self, event, ticks):
+        """
+        PIR rising edge at ticks (events.py handler): counts as motion even
+        if the level has dropped again before the next update().
+        """
+        if hasattr(self.pir, "ready") and not self.pir.ready(ticks):
+            return
+        self._edge_ms = ticks
+        self._edge = True
+
+    def _velocity(self, distance, now):
+        """mm/s from the sensor's filter, else from the last two readings."""
+        if getattr(self.distance, "filter", None) is not None:
+            return self.distance.velocity()     # 0 is a real reading here.
+        v = 0
+        if self._last_dist is not None:
+            dt = ticks_diff(now, self._last_dist_ms)
+            if dt > 0:
+                v = (distance - self._last_dist) * 1000 // dt
+        self._last_dist = distance
+        self._last_dist_ms = now
+        return v
+
+    def _schedule(self, active, distance, now):
+        """Pick the next sampling period from distance and its rate of change."""
+        lo, hi = self.min_period_ms, self.max_period_ms
+        if not active or distance is None:
+            self._last_dist = None
+            self.period_ms = hi
+            return
+
+        # Closer => faster.
+        span = self.far_mm - self.near_mm
+        near = min(max(distance - self.near_mm, 0), span)
+        by_distance = lo + (hi - lo) * near // span if span > 0 else lo
+
+        # Moving => faster.
+        speed = abs(self._velocity(distance, now))
+        by_speed = hi - (hi - lo) * min(speed, self.fast_mm_s) // self.fast_mm_s
+
+        self.period_ms = min(by_distance, by_speed)
 
     def update(self):
         """
         Returns:
           - active (bool): should fuzzy logic run?
           - distance (mm or None): current distance (if active).
+        Also updates period_ms, the suggested delay before the next update.
         """
         try:
             now = ticks_ms()
@@ -27,11 +86,20 @@ class MotionDistanceManager:
                 print("PIR read error in manager:", e)
                 pir_value = 0
 
+            # --- EDGE (timestamped by the IRQ) ---
+            edge = self._edge
+            if edge:
+                self._edge = False
+                if self.state == "IDLE" or ticks_diff(self._edge_ms, self.last_motion) > 0:
+                    self.last_motion = self._edge_ms
+
             # --- STATE LOGIC ---
             if self.state == "IDLE":
                 if pir_value == 1:  # Motion detected.
                     self.state = "ACTIVE"
                     self.last_motion = now
+                elif edge and ticks_diff(now, self.last_motion) <= self.active_ms:
+                    self.state = "ACTIVE"  # Short pulse between two updates.
 
             elif self.state == "ACTIVE":
                 if pir_value == 1:
@@ -49,6 +117,7 @@ class MotionDistanceManager:
                     print("Distance read error in manager:", e)
                     distance = None
 
+            self._schedule(active, distance, now)
             return active, distance
 
         except Exception as e:
@@ -1,13 +1,23 @@
 from machine import Pin, time_pulse_us
-from time import sleep_us, ticks_ms, ticks_diff
+from time import sleep_us, ticks_ms, ticks_us, ticks_diff
 
 class Ultrasonic:
-    def __init__(self, trig_pin, echo_pin, max_distance_mm=2000, samples=3):
+    def __init__(self, trig_pin, echo_pin, max_distance_mm=2000, samples=3,
+                 mode="blocking", timeout_us=30_000, distance_filter=None,
+                 max_age_ms=500):
         """
         Ultrasonic distance sensor.
         trig_pin, echo_pin: GPIO numbers
         max_distance_mm: maximum measurable distance (beyond = None)
-        samples: number of readings to average for smoothing
+        samples: number of readings to average for smoothing (blocking mode)
+        mode: 'blocking' (time_pulse_us per sample) or 'irq' (echo edges
+              timestamped in a pin IRQ; read() collects the previous ping
+              and fires the next one, never waiting for the echo)
+        timeout_us: echo timeout
+        distance_filter: streaming filter from input.filters; when set,
+              each read() takes one ping and returns the filtered value
+        max_age_ms: IRQ mode; a ping fired longer ago than this (e.g. after
+              an idle gap) is stale, so read() pings again and waits instead
         """
         try:
             self.trig = Pin(trig_pin, Pin.OUT)  # Init trigger pin.
@@ -18,6 +28,46 @@ class Ultrasonic:
             self.echo = None
         self.max_distance_mm = max_distance_mm
         self.samples = samples
+        self.mode = mode
+        self.timeout_us = timeout_us
+        self.filter = distance_filter
+        self.max_age_ms = max_age_ms
+
+        # IRQ-mode state (written by _echo_irq).
+        self._pending = False   # A ping is in flight.
+        self._fired_at = 0      # ticks_us when the ping was fired.
+        self._fired_ms = None   # Same in ticks_ms (age check survives long gaps).
+        self._rise_at = 0       # ticks_us of the echo rising edge.
+        self._rising = False    # Rising edge seen for this ping.
+        self._pulse = -1        # Echo width in us, -1 until complete.
+        self._last = None       # Last collected distance.
+
+        if mode == "irq" and self.echo:
+            # Hard IRQ: a soft (scheduled) handler would read ticks_us late
+            # while the VM is busy (gc, socket I/O); 1 ms late = ~171 mm.
+            try:
+                self.echo.irq(trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING,
+                              handler=self._echo_irq, hard=True)
+            except Exception as e:
+                print("Ultrasonic IRQ init error:", e)
+                self.mode = "blocking"
+
+    def _fire(self):
+        """Send the 10 us trigger pulse."""
+        self.trig.low()
+        sleep_us(2)
+        self.trig.high()
+        sleep_us(10)
+        self.trig.low()
+
+    def _to_mm(self, pulse):
+        """Echo width (us) to distance in mm, None if out of range."""
+        if pulse < 0:
+            return None
+        dist = int(pulse * 0.1715)  # mm.
+        if dist > self.max_distance_mm:
+            return None
+        return dist
 
     def _single_read(self):
         """Perform one ultrasonic measurement (raw)."""
@@ -25,29 +75,95 @@ class Ultrasonic:
             return None  # No hardware init.
 
         try:
-            # Trigger pulse.
-            self.trig.low()
-            sleep_us(2)
-            self.trig.high()
-            sleep_us(10)
-            self.trig.low()
+            self._fire()
 
             # Measure echo.
-            pulse = time_pulse_us(self.echo, 1, 30_000)  # timeout 30ms.
-            if pulse < 0:
-                return None
-            dist = int(pulse * 0.1715)  # mm.
-            if dist > self.max_distance_mm:
-                return None
-            return dist
+            pulse = time_pulse_us(self.echo, 1, self.timeout_us)
+            return self._to_mm(pulse)
         except Exception as e:
             print("Ultrasonic read error:", e)
             return None
 
+    def velocity(self):
+        """Approach velocity in mm/s from the filter (0 without one)."""
+        return self.filter.velocity() if self.filter is not None else 0
+
+    # ---------- IRQ mode ----------
+    def _echo_irq(self, pin):
+        """Timestamp echo edges (hard IRQ: no allocation, no printing)."""
+        if not self._pending:
+            return
+        now = ticks_us()
+        if pin.value():
+            self._rise_at = now
+            self._rising = True
+        elif self._rising:
+            self._pulse = ticks_diff(now, self._rise_at)
+            self._pending = False
+
+    def _start_ping(self):
+        self._rising = False
+        self._pulse = -1
+        self._fired_at = ticks_us()
+        self._fired_ms = ticks_ms()
+        self._pending = True
+        self._fire()
+
+    def _ping_now(self):
+        """Fire a ping and wait for its echo (up to timeout_us)."""
+        self._start_ping()
+        while self._pending and ticks_diff(ticks_us(), self._fired_at) < self.timeout_us:
+            sleep_us(100)
+        if self._pending:
+            self._pending = False
+            return None
+        return self._to_mm(self._pulse)
+
+    def _collect(self):
+        """
+        Return the distance of the previous ping and fire the next one.
+        While the previous echo is still in flight, return the last value.
+        If the previous ping is stale, measure afresh (blocking) instead.
+        """
+        if not self.trig or not self.echo:
+            return None
+
+        try:
+            if self._fired_ms is None or ticks_diff(ticks_ms(), self._fired_ms) > self.max_age_ms:
+                self._pending = False
+                self._last = self._ping_now()
+            elif self._pending:
+                if ticks_diff(ticks_us(), self._fired_at) < self.timeout_us:
+                    return self._last       # Echo still in flight.
+                self._pending = False       # Timed out: nothing in range.
+                self._last = None
+            else:
+                self._last = self._to_mm(self._pulse)
+
+            self._start_ping()
+            return self._last
+        except Exception as e:
+            print("Ultrasonic IRQ read error:", e)
+            self._pending = False
+            return None
+
     def read(self):
         """
         Return averaged distance in mm (or None if no valid reading).
+        In IRQ mode this is the single ping fired by the previous call.
+        With a distance filter, one ping per call feeds the filter.
         """
+        if self.filter is not None:
+            try:
+                raw = self._collect() if self.mode == "irq" else self._single_read()
+                return self.filter.update(raw)
+            except Exception as e:
+                print("Ultrasonic filter error:", e)
+                return None
+
+        if self.mode == "irq":
+            return self._collect()
+
         readings = []
         try:
             for _ in range(self.samples):
@@ -76,6 +192,11 @@ class PIR:
         self.warmup_ms = warmup_ms
         self.start_time = ticks_ms()
 
+    def ready(self, now=None):
+        """True once the warm-up period is over."""
+        now = ticks_ms() if now is None else now
+        return ticks_diff(now, self.start_time) >= self.warmup_ms
+
     def read(self):
         """
         Return 0 or 1 after warm-up period.
@@ -0,0 +1,127 @@
+# log.py – leveled logger with per-module masks and a RAM ring buffer.
+#
+#   log.debug(log.NET, "DATA send error:", ex)
+#
+# Calls take the message plus up to three values (print-style, joined by
+# spaces). A call below `level` or outside `mask` returns before any
+# formatting and, having no *args, allocates nothing. Enabled lines go to
+# a fixed ring buffer (oldest lines are overwritten) instead of blocking
+# on the USB serial port; `echo` also prints them, and `sink` (set by the
+# LOG STREAM command) forwards them to a control client.
+
+from time import ticks_ms
+
+# Levels.
+DEBUG = 10
+INFO = 20
+WARN = 30
+ERROR = 40
+OFF = 100
+
+# Modules (mask bits).
+MAIN = 1
+NET = 2         # Data link (socket_client).
+CMD = 4         # Command server / runtime clients.
+IO = 8          # Buttons, PIR, sensors.
+ALL = 0xFF
+
+LEVELS = {"DEBUG": DEBUG, "INFO": INFO, "WARN": WARN, "ERROR": ERROR, "OFF": OFF}
+_LEVEL_CHAR = {DEBUG: "D", INFO: "I", WARN: "W", ERROR: "E"}
+_MODULE_NAME = {MAIN: "main", NET: "net", CMD: "cmd", IO: "io"}
+
+level = INFO
+mask = ALL
+echo = False            # Also print() enabled lines (host runs / bench debugging).
+sink = None             # fn(bytes) receiving each line, e.g. a streaming client.
+
+SIZE = 2048             # Ring buffer bytes.
+_buf = bytearray(SIZE)
+_start = 0              # Oldest byte.
+_len = 0
+_in_sink = False
+dropped = 0             # Lines overwritten before being dumped.
+
+_NO = object()          # "No value" marker (None is a valid value).
+
+
+def on(lvl, mod):
+    """True if a message at lvl from mod would be kept."""
+    return lvl >= level and mod & mask
+
+
+def _store(data):
+    """Append one encoded line, evicting whole old lines to make room."""
+    global _start, _len, dropped
+    n = len(data)
+    if n > SIZE:
+        data = memoryview(data)[n - SIZE:]
+        n = SIZE
+    while SIZE - _len < n:
+        i = 0
+        while _buf[(_start + i) % SIZE] != 10:
+            i += 1
+        _start = (_start + i + 1) % SIZE
+        _len -= i + 1
+        dropped += 1
+    end = (_start + _len) % SIZE
+    first = min(n, SIZE - end)
+    mv = memoryview(_buf)
+    mv[end:end + first] = data[:first]
+    if first < n:
+        mv[:n - first] = data[first:]
+    _len += n
+
+
+def _emit(lvl, mod, msg, a, b, c):
+    global _in_sink
+    parts = [str(ticks_ms()), _LEVEL_CHAR.get(lvl, "?"), _MODULE_NAME.get(mod, "?") + ":", msg]
+    for v in (a, b, c):
+        if v is not _NO:
+            parts.append(str(v))
+    line = " ".join(parts)
+    data = (line + "\n").encode()
+    _store(data)
+    if echo:
+        print(line)
+    if sink is not None and not _in_sink:
+        _in_sink = True
+        try:
+            sink(data)
+        except Exception:
+            pass
+        finally:
+            _in_sink = False
+
+
+def debug(mod, msg, a=_NO, b=_NO, c=_NO):
+    if DEBUG >= level and mod & mask:
+        _emit(DEBUG, mod, msg, a, b, c)
+
+
+def info(mod, msg, a=_NO, b=_NO, c=_NO):
+    if INFO >= level and mod & mask:
+        _emit(INFO, mod, msg, a, b, c)
+
+
+def warn(mod, msg, a=_NO, b=_NO, c=_NO):
+    if WARN >= level and mod & mask:
+        _emit(WARN, mod, msg, a, b, c)
+
+
+def error(mod, msg, a=_NO, b=_NO, c=_NO):
+    if ERROR >= level and mod & mask:
+        _emit(ERROR, mod, msg, a, b, c)
+
+
+def dump():
+    """Ring buffer contents, oldest line first (bytes)."""
+    end = _start + _len
+    if end <= SIZE:
+        return bytes(_buf[_start:end])
+    return bytes(_buf[_start:]) + bytes(_buf[:end - SIZE])
+
+
+def clear():
+    global _start, _len
+    _start = 0
+    _len = 0
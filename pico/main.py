@@ -1,20 +1,28 @@
 # main.py – Pico firmware with Wi-Fi watchdog.
 import boot
 import machine
-import gc, network
-from time import ticks_ms, ticks_diff, sleep_ms
+import network
+from time import ticks_ms, ticks_us, ticks_diff
 from machine import Pin
 import socket_client as sc
 import socket_server as ss
-from utils import dbg, green_irq, red_irq, pir_irq
+from publisher import Publisher
+import profiler as prof
+import memory
+import events
+import log
+from scheduler import Scheduler
+from utils import green_irq, red_irq, pir_irq
 import utils
 
 # FuzzyDistancePWM runtime imports
 from input.sensors import PIR, Ultrasonic
+from input.filters import MedianFilter
 from input.interaction import MotionDistanceManager
 from output.pwm import PWM
 from fuzz.fuzzy_core import FuzzyCore
-from fuzz.fuzzy_config import input_sets, output_sets, output_ranges, rules
+from fuzz.fuzzy_config import input_sets, output_sets, output_ranges, rules, lut_step, lut_check
+from fuzz.fuzzy_config import defuzz_methods, sample_steps, cache_size, cache_bucket
 ssid = boot.SSID
 pwd = boot.PWD
 
@@ -38,7 +46,7 @@ def wifi_watchdog(ssid: str, pwd: str, retry_ms: int = 10_000):
     _last_wifi_try = now
     wlan.active(True)
     wlan.connect(ssid, pwd)
-    dbg("Wi-Fi watchdog: attempting reconnect")
+    log.info(log.NET, "Wi-Fi watchdog: attempting reconnect")
 
 # Data watchdog: maintain socket connection.
 # ------------------------------------------------------------------ #
@@ -64,31 +72,111 @@ pir_pin.irq(trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, handler=pir_irq)  # PIR de
 
 # Hardware components.
 # ------------------------------------------------------------------ #
-ultra = Ultrasonic(15, 16)  # Ultrasonic on GPIO15/16.
-manager = MotionDistanceManager(pir_sensor, ultra, active_ms=60000)
+ultra = Ultrasonic(15, 16, mode="irq",   # Ultrasonic on GPIO15/16, IRQ-timed echo.
+                   distance_filter=MedianFilter(size=5))
+manager = MotionDistanceManager(pir_sensor, ultra, active_ms=60000,
+                                min_period_ms=50, max_period_ms=250)
 
-controller = FuzzyCore(input_sets, output_sets, rules, output_ranges)
-buzzer = PWM(pin=28, mode="buzzer")  # Buzzer output
+
+def _on_motion(event, ticks):
+    """PIR edges count as motion only while the system is ON (as utils._on_pir)."""
+    if utils.sys_on:
+        manager.on_motion(event, ticks)
+
+
+events.subscribe(events.PIR_RISE, _on_motion)   # Edge timestamps.
+
+controller = FuzzyCore(input_sets, output_sets, rules, output_ranges,
+                       lut_range=(utils.min_dist, utils.max_dist) if lut_step else None,
+                       lut_step=lut_step or 1, lut_check=lut_check,
+                       defuzz_methods=defuzz_methods, sample_steps=sample_steps,
+                       cache_size=cache_size, cache_bucket=cache_bucket)
+if controller.lut_error is not None:
+    log.info(log.MAIN, "Fuzzy table max error:", controller.lut_error)
+buzzer = PWM(pin=28, mode="buzzer",    # Buzzer output
+             freq_hysteresis=10, duty_hysteresis=1,     # Hz / % not worth a write
+             max_freq_step=400, max_duty_step=20)       # per tick (no clicks)
 
 
 # Other constants.
 # ------------------------------------------------------------------ #
 blink_ms = 100
 last_alert_state = False  # track last PIR alert status
+# Heartbeat well inside the dashboard's 2 s freshness window (index.html),
+# or a still target flips it to "Stopped" and re-raises the alert.
+distance_pub = Publisher(deadband=20, deadband_rel=0.02,   # mm / fraction
+                         min_interval_ms=100, max_interval_ms=1000)
 
 
-# Start command server once.
+# Loop profiling (STATS command / "stats:" telemetry).
 # ------------------------------------------------------------------ #
-cmd_srv = ss.make_cmd_server()
+P_WIFI = prof.stage("wifi")
+P_DATA = prof.stage("data")
+P_CMD = prof.stage("commands")
+P_SENSE = prof.stage("manager")
+P_FUZZY = prof.stage("fuzzy")
+P_PWM = prof.stage("pwm")
+P_TELEMETRY = prof.stage("telemetry")
+P_LOOP = prof.stage("loop")
+_last_stats_ms = 0
 
-print("Boot complete. Entering main loop.")
 
-while True:
-    now = ticks_ms()
+def _cmd_stats(arg):
+    return "%s\n%s\npwm writes=%d skipped=%d" % (
+        prof.report(), sched.line(), buzzer.writes, buzzer.skipped)
 
-    wifi_watchdog(ssid, pwd)
-    data_watchdog()
-    ss.poll_command(cmd_srv, ping_led)
+
+def _cmd_stats_reset(arg):
+    prof.reset()
+    return "OK"
+
+
+def _cmd_stats_stream(arg):
+    """STATS STREAM <ms>: send the report as telemetry every ms (0 = off)."""
+    ms = ss.int_arg(arg)
+    if ms is None:
+        return "ERR STATS STREAM"
+    prof.stream_ms = max(0, ms)
+    return "OK STREAM %d" % prof.stream_ms
+
+
+ss.register("STATS", _cmd_stats)
+ss.register("STATS RESET", _cmd_stats_reset)
+ss.register("STATS STREAM", _cmd_stats_stream)
+
+# Heap tracking (MEM command); collections run in the loop's idle time.
+M_WIFI = memory.probe("wifi")
+M_DATA = memory.probe("data")
+M_CMD = memory.probe("commands")
+M_CONTROL = memory.probe("control")
+M_TELEMETRY = memory.probe("telemetry")
+M_LOOP = memory.probe("loop")
+
+
+def _cmd_mem(arg):
+    return memory.report()
+
+
+def _cmd_mem_frag(arg):
+    memory.check_fragmentation()
+    return memory.report()
+
+
+ss.register("MEM", _cmd_mem)
+ss.register("MEM FRAG", _cmd_mem_frag)
+
+
+# Command server: created by run() (loop runtime) or runtime.py (asyncio).
+# ------------------------------------------------------------------ #
+cmd_srv = None
+
+
+# Loop steps (shared by run() and the asyncio runtime).
+# ------------------------------------------------------------------ #
+def housekeeping():
+    """IRQ events, ping LED blink and system status LED."""
+    events.drain()
+    now = ticks_ms()
 
     # Blink ping LED briefly when PING received.
     if ping_led.value() and ticks_diff(now, ss.get_last_ping_time()) > blink_ms:
@@ -97,43 +185,182 @@ while True:
     # Update system status LED (ON/OFF indicator)
     sys_led.value(1 if utils.sys_on else 0)
 
+    stream_stats(now)
+
+
+def stream_stats(now):
+    """Send the profiler report as "stats:" lines every prof.stream_ms."""
+    global _last_stats_ms
+    if not prof.stream_ms or ticks_diff(now, _last_stats_ms) < prof.stream_ms:
+        return
+    _last_stats_ms = now
+    if sc.is_connected():
+        for st in prof.stages():
+            if st.count:
+                sc.write_line("stats: " + st.line())
+
+
+def control():
+    """
+    PIR + distance + fuzzy logic + buzzer.
+    Returns (active, distance), or None while the system is OFF.
+    """
     # -----------------------------
     # System OFF => disable outputs
     # -----------------------------
     if not utils.sys_on:
         buzzer.off()
-        last_alert_state = False
-        sleep_ms(100)
-        continue
-    
+        return None
 
     # -------------------------------------
     # System ON → handle PIR + fuzzy logic
     # -------------------------------------
+    t = ticks_us()
     active, distance = manager.update()
-    dbg("manager says: ", active, distance)
+    t = prof.lap(P_SENSE, t)
+    log.debug(log.MAIN, "manager says:", active, distance)
 
-    # --- Alert message handling ---
-    if active != last_alert_state:
-        sc.write_line("alert: 1" if active else "alert: 0")
-        dbg(f"Sent alert: {'1' if active else '0'}")
-        last_alert_state = active
+    # Range of interest (SET MIN / SET MAX): beyond max = no target.
+    # Closer than min drives the buzzer as at min; the measured
+    # distance is still what gets published.
+    if distance is not None and distance > utils.max_dist:
+        distance = None
 
     # --- Distance + buzzer control ---
     if active and distance is not None:
-        fuzzy_out = controller.compute({"distance": distance})
+        t = ticks_us()
+        fuzzy_out = controller.compute({"distance": max(distance, utils.min_dist)})
+        t = prof.lap(P_FUZZY, t)
         duty = fuzzy_out["duty"]
         freq = min(max(100, fuzzy_out["freq"]), 2000)
         buzzer.update(freq=freq, duty=duty)
-
-        sc.write_line(f"distance: {distance}")
-        #dbg(f"distance sent: {distance} mm | duty={duty:.1f} freq={freq} Hz")
-        dbg(f"distance sent: {distance} mm")
+        prof.lap(P_PWM, t)
+        #log.debug(log.MAIN, "buzzer: mm/duty/freq", distance, duty, freq)
     else:
         buzzer.off()
 
-    # Garbage collect every 5s.
-    if now % 5000 < 50:
-        gc.collect()
+    return active, distance
 
-    sleep_ms(100)
+
+def publish(state):
+    """Send alert changes and the current distance for a control() result."""
+    global last_alert_state
+
+    if state is None:
+        last_alert_state = False
+        return
+    active, distance = state
+
+    # --- Alert message handling ---
+    if active != last_alert_state:
+        sc.send_alert(active)
+        log.info(log.MAIN, "Sent alert:", 1 if active else 0)
+        last_alert_state = active
+        distance_pub.reset()    # First distance of a new alert goes out at once.
+
+    # --- Distance telemetry (deadband + rate limit) ---
+    if active and distance is not None and distance_pub.should_send(distance):
+        sc.send_distance(distance)
+        log.debug(log.MAIN, "distance sent:", distance)
+
+
+# Main loop.
+# ------------------------------------------------------------------ #
+def tick():
+    """One main-loop iteration (the loop period sleep is in run())."""
+    M_LOOP.begin()
+    t0 = t = ticks_us()
+
+    M_WIFI.begin()
+    wifi_watchdog(ssid, pwd)
+    M_WIFI.end()
+    t = prof.lap(P_WIFI, t)
+    M_DATA.begin()
+    data_watchdog()
+    M_DATA.end()
+    t = prof.lap(P_DATA, t)
+    M_CMD.begin()
+    ss.poll_command(cmd_srv, ping_led)
+    M_CMD.end()
+    prof.lap(P_CMD, t)
+
+    housekeeping()
+    M_CONTROL.begin()
+    state = control()           # Times its own stages.
+    M_CONTROL.end()
+    t = ticks_us()
+    M_TELEMETRY.begin()
+    publish(state)
+    M_TELEMETRY.end()
+    prof.lap(P_TELEMETRY, t)
+    prof.lap(P_LOOP, t0)
+
+    M_LOOP.end()
+    memory.sample()
+
+
+def service():
+    """Early wake-up: commands and IRQ events only, control waits for its deadline."""
+    ss.poll_command(cmd_srv, ping_led)
+    housekeeping()
+
+
+def _wake():
+    """End the loop sleep early on a button/PIR edge or control data."""
+    global _seen_events
+    if events.posted != _seen_events:
+        _seen_events = events.posted
+        return True
+    return ss.input_ready()
+
+
+_seen_events = 0
+sched = Scheduler(slice_ms=10, lightsleep=False, wake=_wake)
+
+
+def loop_period_ms():
+    """Adaptive rate: fast when a target is close/moving, slow otherwise."""
+    return manager.period_ms if utils.sys_on else manager.max_period_ms
+
+
+def run(ticks=None):
+    """Run the main loop; ticks=None runs forever (host simulator steps N)."""
+    global cmd_srv
+    if cmd_srv is None:
+        cmd_srv = ss.make_cmd_server()
+
+    n = 0
+    while ticks is None or n < ticks:
+        tick()
+        # Idle until the next deadline; a due collection runs in this slack.
+        period = loop_period_ms()
+        memory.maintain(sched.slack_ms(period))
+        while sched.wait(period):
+            service()
+            period = loop_period_ms()       # START/STOP may change it.
+        n += 1
+
+
+def runtime_tasks():
+    """Step functions for the asyncio runtime (see runtime.py)."""
+    return {
+        "wifi": lambda: wifi_watchdog(ssid, pwd),
+        "data": data_watchdog,
+        "control": control,
+        "publish": publish,
+        "housekeeping": housekeeping,
+        "control_period": loop_period_ms,
+        "memory": memory.maintain,
+        "ping_led": ping_led,
+    }
+
+
+memory.setup()          # Budget / gc.threshold from the heap left after boot.
+print("Boot complete. Entering main loop.")
+
+if __name__ == "__main__":
+    if utils.use_asyncio:
+        import runtime
+        runtime.start(**runtime_tasks())
+    else:
+        run()
@@ -0,0 +1,165 @@
+# memory.py – heap tracking and garbage collection in idle time.
+#
+# gc.threshold() is set from a budget as a safety net, but collections
+# are normally run by maintain() at the end of a loop iteration, when
+# there is slack before the next one, instead of wherever an allocation
+# happens to cross the threshold (e.g. in the middle of the fuzzy/PWM step).
+# On CPython (host simulator) the heap figures read as 0.
+
+import gc
+from time import ticks_ms, ticks_us, ticks_diff
+
+_HAS_HEAP = hasattr(gc, "mem_alloc")
+
+BUDGET_FRACTION = 4     # Default budget: 1/4 of the heap between collections.
+HIGH_WATER = 50         # Collect in idle time at this % of the budget ...
+MIN_SLACK_MS = 5        # ... if at least this much slack is left,
+MAX_INTERVAL_MS = 10_000  # and at least this often regardless.
+
+budget = 0              # Bytes allowed between collections (0 = unknown).
+peak_alloc = 0          # Highest mem_alloc seen by sample().
+min_free = -1           # Lowest mem_free seen by sample().
+collections = 0         # Collections run by maintain().
+gc_us_max = 0           # Longest of those.
+fragmentation = 0       # % of free heap not in the largest block (last check).
+
+_base = 0               # mem_alloc right after the last collection.
+_last_gc_ms = 0
+_requested = False      # request() asks the next maintain() to collect.
+_probes = []
+
+
+def mem_alloc():
+    return gc.mem_alloc() if _HAS_HEAP else 0
+
+
+def mem_free():
+    return gc.mem_free() if _HAS_HEAP else 0
+
+
+def setup(budget_bytes=None):
+    """Set the allocation budget (default: a fraction of the heap) and gc.threshold."""
+    global budget, _base, _last_gc_ms
+    gc.collect()
+    _base = mem_alloc()
+    _last_gc_ms = ticks_ms()
+    heap = mem_alloc() + mem_free()
+    budget = budget_bytes if budget_bytes else heap // BUDGET_FRACTION
+    if budget and hasattr(gc, "threshold"):
+        gc.threshold(budget)
+
+
+class Probe:
+    def __init__(self, name):
+        """Bytes allocated between begin() and end(), per call."""
+        self.name = name
+        self.count = 0
+        self.max = 0
+        self._sum = 0       # Sum and count behind the mean (rescaled together).
+        self._n = 0
+        self._a0 = 0
+
+    def begin(self):
+        self._a0 = mem_alloc()
+
+    def end(self):
+        used = mem_alloc() - self._a0
+        if used < 0:
+            return          # A collection ran inside the stage.
+        self.count += 1
+        self._sum += used
+        self._n += 1
+        if self._sum > 1 << 29:
+            self._sum >>= 1
+            self._n = (self._n + 1) >> 1
+        if used > self.max:
+            self.max = used
+
+    def line(self):
+        mean = self._sum // self._n if self._n else 0
+        return "%s n=%d mean=%d max=%d B" % (self.name, self.count, mean, self.max)
+
+
+def probe(name):
+    """Create and register an allocation probe (do this once, at import time)."""
+    p = Probe(name)
+    _probes.append(p)
+    return p
+
+
+def sample():
+    """Track heap peak / free low-water mark (once per loop iteration)."""
+    global peak_alloc, min_free
+    a = mem_alloc()
+    f = mem_free()
+    if a > peak_alloc:
+        peak_alloc = a
+    if min_free < 0 or f < min_free:
+        min_free = f
+
+
+def request():
+    """Ask for a collection at the next idle maintain() (e.g. after freeing a socket)."""
+    global _requested
+    _requested = True
+
+
+def maintain(slack_ms=None):
+    """
+    Collect if requested, the budget is half used or the last collection
+    is old, and there is enough idle time (slack_ms None = caller is idle
+    anyway). Returns True if a collection ran.
+    """
+    global _base, _last_gc_ms, _requested, collections, gc_us_max
+    if slack_ms is not None and slack_ms < MIN_SLACK_MS:
+        return False
+    now = ticks_ms()
+    used = mem_alloc() - _base
+    under = not budget or used * 100 < budget * HIGH_WATER
+    if under and not _requested and ticks_diff(now, _last_gc_ms) < MAX_INTERVAL_MS:
+        return False
+
+    t0 = ticks_us()
+    gc.collect()
+    us = ticks_diff(ticks_us(), t0)
+    _base = mem_alloc()
+    _last_gc_ms = now
+    _requested = False
+    collections += 1
+    if us > gc_us_max:
+        gc_us_max = us
+    return True
+
+
+def check_fragmentation():
+    """
+    Find the largest allocatable block (binary search, then collect) and
+    update `fragmentation`. Slow; run on demand, not every tick.
+    """
+    global fragmentation
+    gc.collect()
+    free = mem_free()
+    if not free:
+        return 0
+    lo, hi = 0, free
+    while hi - lo > 64:
+        mid = (lo + hi) // 2
+        try:
+            block = bytearray(mid)
+            block = None
+            lo = mid
+        except MemoryError:
+            hi = mid
+        gc.collect()
+    fragmentation = 100 - lo * 100 // free
+    return fragmentation
+
+
+def report():
+    lines = ["heap alloc=%d free=%d peak=%d min_free=%d budget=%d" % (
+                 mem_alloc(), mem_free(), peak_alloc, min_free, budget),
+             "gc runs=%d max=%d us frag=%d%%" % (collections, gc_us_max, fragmentation)]
+    for p in _probes:
+        if p.count:
+            lines.append(p.line())
+    return "\n".join(lines)
@@ -1,13 +1,29 @@
 from machine import Pin, PWM as HW_PWM
 
 class PWM:
-    def __init__(self, pin, mode="generic", freq=1000, duty=0):
+    def __init__(self, pin, mode="generic", freq=1000, duty=0,
+                 freq_hysteresis=0, duty_hysteresis=0,
+                 max_freq_step=None, max_duty_step=None):
         """
         Generic PWM controller.
         mode: 'buzzer', 'led', 'servo', or 'generic'
         freq: default frequency in Hz.
         duty: initial duty in % (0-100).
+        freq_hysteresis / duty_hysteresis: changes up to this much (Hz / %)
+            are not written to the hardware (a freq write restarts the counter).
+        max_freq_step / max_duty_step: slew limit per update() call (Hz / %),
+            None = jump straight to the target.
         """
+        self.freq_hysteresis = freq_hysteresis
+        self._duty_hyst = int(duty_hysteresis * 65535 // 100)
+        self.max_freq_step = max_freq_step
+        self._duty_step = int(max_duty_step * 65535 // 100) if max_duty_step else None
+        self._freq = None   # Last programmed values (None = unknown).
+        self._duty = None
+
+        # Counters.
+        self.writes = 0
+        self.skipped = 0
         try:
             self.pin = Pin(pin, Pin.OUT)  # Init pin.
             self.pwm = HW_PWM(self.pin)   # Init hardware PWM.
@@ -19,41 +35,71 @@ class PWM:
             print("PWM init error:", e)
             self.pwm = None
 
-    def set_frequency(self, freq):
+    @staticmethod
+    def _to_u16(duty_percent):
+        # Clamp 0-100% and map to 0-65535.
+        duty_percent = min(max(duty_percent, 0), 100)
+        return int(duty_percent * 65535 // 100)
+
+    def set_frequency(self, freq, force=False):
         # Clamp to safe MicroPython range.
         try:
             freq = min(max(int(freq), 1), 20000)  # 1 Hz to 20 kHz.
-            if self.pwm:
-                self.pwm.freq(freq)
+            if not self.pwm:
+                return
+            if (not force and self._freq is not None
+                    and abs(freq - self._freq) <= self.freq_hysteresis):
+                self.skipped += 1
+                return
+            self.pwm.freq(freq)
+            self._freq = freq
+            self.writes += 1
         except Exception as e:
             print("PWM freq error:", e)
 
-    def set_duty(self, duty_percent):
-        # Clamp 0-100% and map to 0-65535.
+    def _write_duty(self, value, force=False):
+        """Program duty_u16 unless within the hysteresis (0 is always exact)."""
+        if not self.pwm:
+            return
+        if (not force and self._duty is not None
+                and abs(value - self._duty) <= self._duty_hyst
+                and (value != 0 or self._duty == 0)):
+            self.skipped += 1
+            return
+        self.pwm.duty_u16(value)
+        self._duty = value
+        self.writes += 1
+
+    def set_duty(self, duty_percent, force=False):
         try:
-            duty_percent = min(max(duty_percent, 0), 100)
-            if self.pwm:
-                self.pwm.duty_u16(int(duty_percent / 100 * 65535))
+            self._write_duty(self._to_u16(duty_percent), force)
         except Exception as e:
             print("PWM duty error:", e)
 
     def update(self, freq=None, duty=None):
         """
-        Update both frequency and duty if provided.
+        Update both frequency and duty if provided, moving at most
+        max_freq_step / max_duty_step from the programmed values.
         """
         try:
             if freq is not None:
+                step = self.max_freq_step
+                if step and self._freq is not None:
+                    freq = min(max(freq, self._freq - step), self._freq + step)
                 self.set_frequency(freq)
             if duty is not None:
-                self.set_duty(duty)
+                value = self._to_u16(duty)
+                step = self._duty_step
+                if step and self._duty is not None:
+                    value = min(max(value, self._duty - step), self._duty + step)
+                self._write_duty(value)
         except Exception as e:
             print("PWM update error:", e)
 
     def off(self):
         """Stop output (set duty 0)."""
         try:
-            if self.pwm:
-                self.pwm.duty_u16(0)
+            self._write_duty(0)
         except Exception as e:
             print("PWM off error:", e)
 
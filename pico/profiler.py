@@ -0,0 +1,103 @@
+# profiler.py – per-stage loop timing with ticks_us.
+#
+# Each stage keeps count/min/max/mean and a fixed log2 histogram
+# (bucket i counts durations in [2**i, 2**(i+1)) us, the last bucket is
+# open-ended), so recording never allocates. p95 is read from the
+# histogram, i.e. rounded up to its bucket's upper bound.
+
+from array import array
+from time import ticks_us, ticks_diff
+
+BUCKETS = 16            # 1 us .. 32 ms, then one catch-all bucket.
+_MEAN_LIMIT = 1 << 29   # Rescale the mean accumulator before it leaves small ints.
+
+enabled = True
+stream_ms = 0           # > 0: main.py streams the report as telemetry this often.
+
+_stages = []
+
+
+class Stage:
+    def __init__(self, name):
+        self.name = name
+        self.hist = array("I", bytes(4 * BUCKETS))
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.min = 0
+        self.max = 0
+        self._sum = 0       # Sum and count behind the mean (rescaled together).
+        self._n = 0
+        for i in range(BUCKETS):
+            self.hist[i] = 0
+
+    def add(self, us):
+        """Record one duration in microseconds."""
+        if us < 0:
+            us = 0
+        if self.count == 0 or us < self.min:
+            self.min = us
+        if us > self.max:
+            self.max = us
+        self.count += 1
+
+        self._sum += us
+        self._n += 1
+        if self._sum > _MEAN_LIMIT:
+            self._sum >>= 1
+            self._n = (self._n + 1) >> 1
+
+        b = 0
+        while us > 1 and b < BUCKETS - 1:
+            us >>= 1
+            b += 1
+        self.hist[b] += 1
+
+    def mean(self):
+        return self._sum // self._n if self._n else 0
+
+    def percentile(self, pct):
+        """Upper bound (us) of the histogram bucket holding the pct-th percentile."""
+        if not self.count:
+            return 0
+        need = (self.count * pct + 99) // 100
+        seen = 0
+        for b in range(BUCKETS - 1):
+            seen += self.hist[b]
+            if seen >= need:
+                return min(self.max, (2 << b) - 1)
+        return self.max
+
+    def line(self):
+        return "%s n=%d min=%d mean=%d p95=%d max=%d us" % (
+            self.name, self.count, self.min, self.mean(), self.percentile(95), self.max)
+
+
+def stage(name):
+    """Create and register a stage (do this once, at import time)."""
+    s = Stage(name)
+    _stages.append(s)
+    return s
+
+
+def stages():
+    return _stages
+
+
+def lap(st, t0):
+    """Record ticks_us() - t0 on st; return the new timestamp for the next stage."""
+    now = ticks_us()
+    if enabled:
+        st.add(ticks_diff(now, t0))
+    return now
+
+
+def reset():
+    for s in _stages:
+        s.reset()
+
+
+def report():
+    """One line per stage that has samples."""
+    return "\n".join(s.line() for s in _stages if s.count) or "no samples"
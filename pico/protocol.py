@@ -0,0 +1,163 @@
+# protocol.py – telemetry wire format, shared by the Pico and host tools.
+#
+# Text (default, what the .NET backend reads): "alert: 1\n", "distance: 1234\n".
+#
+# Binary v1, little-endian, one frame per message:
+#   [magic 0xA5][version][type][len][seq u16][ticks_ms u32][payload: len bytes]
+# Payloads: ALERT = u8 0/1, DISTANCE = u16 mm, TEXT = ASCII without "\n"
+# (at most MAX_TEXT bytes; longer text is truncated, len is one byte).
+#
+# Negotiation: after connecting the client sends HELLO; a host that answers
+# ACCEPT gets binary frames for the rest of that connection. Hosts that
+# never answer (the .NET backend ignores unknown lines) keep getting text.
+# The magic byte is not ASCII, so a decoder can read a stream that switches
+# from text to binary mid-way.
+
+import struct
+
+MAGIC = 0xA5
+VERSION = 1
+
+HEADER = "<BBBBHI"
+HEADER_SIZE = 10
+MAX_TEXT = 255
+
+HELLO = b"hello: bin1\n"
+ACCEPT = b"proto: bin1\n"
+
+# Message types.
+TEXT = 0
+ALERT = 1
+DISTANCE = 2
+
+# Connection modes.
+TEXT_MODE = 0
+BINARY_MODE = 1
+
+_ALERT_LINES = (b"alert: 0\n", b"alert: 1\n")
+
+
+# Encoding (device side, allocation-free for ALERT/DISTANCE).
+# ----------------------------------------------------------- #
+def _clamp_u16(value):
+    return 0 if value < 0 else 0xFFFF if value > 0xFFFF else value
+
+
+def payload_size(kind, value):
+    if kind == ALERT:
+        return 1
+    if kind == DISTANCE:
+        return 2
+    return min(len(value), MAX_TEXT)
+
+
+def frame_size(kind, value):
+    return HEADER_SIZE + payload_size(kind, value)
+
+
+def pack_into(buf, offset, seq, ticks, kind, value):
+    """Write one binary frame at buf[offset:]; return its size."""
+    n = payload_size(kind, value)
+    struct.pack_into(HEADER, buf, offset, MAGIC, VERSION, kind, n,
+                     seq & 0xFFFF, ticks & 0xFFFFFFFF)
+    p = offset + HEADER_SIZE
+    if kind == ALERT:
+        buf[p] = 1 if value else 0
+    elif kind == DISTANCE:
+        struct.pack_into("<H", buf, p, _clamp_u16(value))
+    else:
+        memoryview(buf)[p:p + n] = memoryview(value)[:n]
+    return HEADER_SIZE + n
+
+
+def text_line(kind, value):
+    """The text-protocol line for one message."""
+    if kind == ALERT:
+        return _ALERT_LINES[1 if value else 0]
+    if kind == DISTANCE:
+        return ("distance: %d\n" % value).encode()
+    return bytes(value) + b"\n"
+
+
+def payload(kind, value):
+    """Binary payload as bytes (what the telemetry queue stores)."""
+    if kind == ALERT:
+        return b"\x01" if value else b"\x00"
+    if kind == DISTANCE:
+        return struct.pack("<H", _clamp_u16(value))
+    return value
+
+
+def value_of(kind, data):
+    """Inverse of payload(): int for ALERT/DISTANCE, the bytes for TEXT."""
+    if kind == ALERT:
+        return data[0]
+    if kind == DISTANCE:
+        return data[0] | (data[1] << 8)
+    return data
+
+
+# Decoding (host side).
+# --------------------- #
+def parse_line(line):
+    """Text line (without "\\n") -> (kind, value)."""
+    key, sep, rest = line.partition(":")
+    if sep:
+        key = key.strip().lower()
+        try:
+            if key == "alert":
+                return ALERT, int(rest)
+            if key == "distance":
+                return DISTANCE, int(rest)
+        except ValueError:
+            pass
+    return TEXT, line
+
+
+class Decoder:
+    def __init__(self):
+        """
+        Incremental decoder for one connection. feed() returns messages as
+        (seq, ticks_ms, kind, value); seq and ticks are None for text lines.
+        """
+        self._buf = bytearray()
+        self._next_seq = None
+        self.hello = False      # Peer offered binary (reply with ACCEPT).
+        self.lost = 0           # Frames missing from the sequence.
+
+    def feed(self, data):
+        self._buf += data
+        buf = self._buf
+        out = []
+        i = 0
+        while i < len(buf):
+            if buf[i] == MAGIC:
+                if len(buf) - i < HEADER_SIZE:
+                    break
+                _, version, kind, n, seq, ticks = struct.unpack_from(HEADER, buf, i)
+                if version != VERSION:
+                    raise ValueError("unsupported protocol version %d" % version)
+                end = i + HEADER_SIZE + n
+                if end > len(buf):
+                    break
+                if self._next_seq is not None:
+                    self.lost += (seq - self._next_seq) & 0xFFFF
+                self._next_seq = (seq + 1) & 0xFFFF
+                value = value_of(kind, bytes(buf[i + HEADER_SIZE:end]))
+                if kind == TEXT:
+                    value = value.decode()
+                out.append((seq, ticks, kind, value))
+                i = end
+            else:
+                j = buf.find(b"\n", i)
+                if j < 0:
+                    break
+                line = bytes(buf[i:j]).decode().strip()
+                i = j + 1
+                if line == HELLO.decode().strip():
+                    self.hello = True
+                elif line:
+                    kind, value = parse_line(line)
+                    out.append((None, None, kind, value))
+        del buf[:i]
+        return out
@@ -0,0 +1,54 @@
+# publisher.py – deadband and rate limit for telemetry values.
+#
+# A value is published when it moved by more than the deadband, but never
+# faster than min_interval_ms; an unchanged value is still re-sent every
+# max_interval_ms as a heartbeat.
+
+from time import ticks_ms, ticks_diff
+
+
+class Publisher:
+    def __init__(self, deadband=20, deadband_rel=0.02, min_interval_ms=100,
+                 max_interval_ms=2000):
+        """
+        deadband: absolute change needed to publish (value units, e.g. mm).
+        deadband_rel: relative change needed (fraction of the last value);
+                      the larger of the two deadbands applies.
+        min_interval_ms: minimum time between two publishes.
+        max_interval_ms: heartbeat; publish at least this often (None = never).
+        """
+        self.deadband = deadband
+        self.deadband_rel = deadband_rel
+        self.min_interval_ms = min_interval_ms
+        self.max_interval_ms = max_interval_ms
+        self._last = None
+        self._last_ms = 0
+
+        # Counters.
+        self.published = 0
+        self.suppressed = 0     # Inside the deadband.
+        self.rate_limited = 0   # Too soon after the last publish.
+
+    def reset(self):
+        """Forget the last value, so the next one is published at once."""
+        self._last = None
+
+    def should_send(self, value, now=None):
+        """True if value should be published now (and record it as sent)."""
+        now = ticks_ms() if now is None else now
+
+        if self._last is not None:
+            elapsed = ticks_diff(now, self._last_ms)
+            if elapsed < self.min_interval_ms:
+                self.rate_limited += 1
+                return False
+            if self.max_interval_ms is None or elapsed < self.max_interval_ms:
+                band = max(self.deadband, abs(self._last) * self.deadband_rel)
+                if abs(value - self._last) < band:
+                    self.suppressed += 1
+                    return False
+
+        self._last = value
+        self._last_ms = now
+        self.published += 1
+        return True
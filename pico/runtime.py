@@ -0,0 +1,159 @@
+# runtime.py – cooperative asyncio runtime (set utils.use_asyncio = True).
+#
+# Wi-Fi watchdog, data link, sensing/fuzzy control, telemetry, LEDs and
+# the command server run as independent tasks with their own periods,
+# so one slow step no longer delays the others. Runs under uasyncio on
+# the Pico and CPython asyncio on the host (see sim).
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+import socket_server as ss
+import log
+from time import ticks_ms, ticks_diff
+
+# Task periods (ms).
+WIFI_MS = 1000
+DATA_MS = 20             # Also flushes batched telemetry (see socket_client).
+TELEMETRY_MS = 100
+HOUSEKEEPING_MS = 50
+MEMORY_MS = 100
+
+_state = None           # Latest control() result, consumed by telemetry.
+_fresh = False          # _state not yet published.
+_clients = {}           # Open control connections: writer -> ticks_ms of last data.
+
+
+async def _sleep_ms(ms):
+    if hasattr(asyncio, "sleep_ms"):
+        await asyncio.sleep_ms(ms)
+    else:
+        await asyncio.sleep(ms / 1000)
+
+
+async def _every(name, period, fn):
+    """Call fn() every period ms (period may be a callable)."""
+    while True:
+        try:
+            fn()
+        except Exception as e:
+            print(f"Task {name} error:", e)
+        await _sleep_ms(period() if callable(period) else period)
+
+
+def _control_step(control):
+    global _state, _fresh
+    _state = control()
+    _fresh = True
+
+
+def _publish_step(publish):
+    global _fresh
+    if _fresh:
+        _fresh = False
+        publish(_state)
+
+
+def _evict_idlest():
+    """At the cap, close the client silent the longest (its task then ends)."""
+    idlest = None
+    for w, last in _clients.items():
+        if idlest is None or ticks_diff(last, _clients[idlest]) < 0:
+            idlest = w
+    log.warn(log.CMD, "CMD client cap reached, dropping idlest")
+    del _clients[idlest]
+    ss.client_closed(idlest)
+    idlest.close()
+
+
+async def _client(reader, writer, ping_led):
+    """One control connection: read lines and dispatch them."""
+    if len(_clients) >= ss.MAX_CLIENTS:
+        _evict_idlest()
+    _clients[writer] = ticks_ms()
+    log.info(log.CMD, "CMD client connected")
+    pending = b""                   # Unfinished line.
+    skip = False                    # Discarding an over-long line.
+    try:
+        while True:
+            # Bounded reads: readline() would buffer a line of any length.
+            data = await asyncio.wait_for(reader.read(ss._RX_SIZE), ss.IDLE_MS / 1000)
+            if not data:
+                break
+            _clients[writer] = ticks_ms()
+            pending += data
+            while True:
+                i = pending.find(b"\n")
+                if i < 0:
+                    break
+                line, pending = pending[:i], pending[i + 1:]
+                if skip:
+                    skip = False
+                    continue
+                reply = ss.handle_command(line, ping_led, writer, writer.write)
+                if reply is not None:
+                    writer.write(reply.encode() + b"\n" if isinstance(reply, str) else reply + b"\n")
+                    await writer.drain()
+            if len(pending) >= ss._RX_SIZE:
+                log.warn(log.CMD, "CMD line too long, discarded")
+                pending = b""
+                skip = True
+    except asyncio.CancelledError:
+        pass                        # Runtime shutting down.
+    except asyncio.TimeoutError:
+        log.info(log.CMD, "CMD client idle, dropped")
+    except Exception as e:
+        log.warn(log.CMD, "CMD client error:", e)
+    finally:
+        _clients.pop(writer, None)
+        ss.client_closed(writer)
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except Exception:
+            pass
+        log.info(log.CMD, "CMD client closed")
+
+
+async def serve(wifi, data, control, publish, housekeeping, control_period,
+                ping_led, memory=None, port=1234, duration_ms=None):
+    """
+    Run all tasks; forever, or for duration_ms (host tests) after which
+    tasks are cancelled and the command server is closed. memory() runs
+    as its own task, so collections fall between the other steps.
+    """
+    server = await asyncio.start_server(
+        lambda r, w: _client(r, w, ping_led), "0.0.0.0", port)
+    log.info(log.CMD, "CMD listening on", port)
+
+    tasks = [
+        asyncio.create_task(_every("wifi", WIFI_MS, wifi)),
+        asyncio.create_task(_every("data", DATA_MS, data)),
+        asyncio.create_task(_every("control", control_period,
+                                   lambda: _control_step(control))),
+        asyncio.create_task(_every("telemetry", TELEMETRY_MS,
+                                   lambda: _publish_step(publish))),
+        asyncio.create_task(_every("housekeeping", HOUSEKEEPING_MS, housekeeping)),
+    ]
+    if memory is not None:
+        tasks.append(asyncio.create_task(_every("memory", MEMORY_MS, memory)))
+
+    try:
+        if duration_ms is None:
+            while True:
+                await _sleep_ms(60_000)
+        else:
+            await _sleep_ms(duration_ms)
+    finally:
+        for t in tasks:
+            t.cancel()
+        server.close()
+        await server.wait_closed()
+
+
+def start(**tasks):
+    """Blocking entry point used by main.py."""
+    print("Starting asyncio runtime.")
+    asyncio.run(serve(**tasks))
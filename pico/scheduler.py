@@ -0,0 +1,78 @@
+# scheduler.py – fixed-rate loop timing against absolute deadlines.
+#
+# wait(period) sleeps until the previous deadline + period, so the time
+# spent in the loop body is absorbed instead of added to the period. A late
+# iteration counts as an overrun and the schedule restarts from now (no
+# catch-up burst). The sleep is cut into short slices so `wake()` (e.g. a
+# PIR/button IRQ or control data) can end it early; the deadline stands,
+# so the caller services the wake-up and waits again.
+
+from time import ticks_ms, ticks_add, ticks_diff, sleep_ms
+
+try:
+    from machine import lightsleep as _lightsleep
+except ImportError:
+    _lightsleep = None
+
+
+class Scheduler:
+    def __init__(self, slice_ms=10, lightsleep=False, lightsleep_min_ms=20, wake=None):
+        """
+        slice_ms: longest sleep between two wake() checks.
+        lightsleep: use machine.lightsleep for slices >= lightsleep_min_ms
+                    (saves power; keep off while Wi-Fi must stay responsive).
+        wake: fn() -> bool, True ends the wait early.
+        """
+        self.slice_ms = slice_ms
+        self.lightsleep = lightsleep and _lightsleep is not None
+        self.lightsleep_min_ms = lightsleep_min_ms
+        self.wake = wake
+        self._deadline = ticks_ms()
+
+        # Counters.
+        self.ticks = 0
+        self.overruns = 0       # Iterations that finished after their deadline.
+        self.max_late_ms = 0
+        self.early_wakes = 0
+
+    def slack_ms(self, period_ms):
+        """Time left before the next deadline (negative = already late)."""
+        return ticks_diff(ticks_add(self._deadline, period_ms), ticks_ms())
+
+    def _sleep(self, ms):
+        if self.lightsleep and ms >= self.lightsleep_min_ms:
+            _lightsleep(ms)
+        else:
+            sleep_ms(ms)
+
+    def wait(self, period_ms):
+        """
+        Sleep until the next deadline. Returns False on time, True if woken
+        early (the deadline is kept: call wait() again to sleep out the rest).
+        """
+        deadline = ticks_add(self._deadline, period_ms)
+        now = ticks_ms()
+        late = ticks_diff(now, deadline)
+        if late > 0:
+            self.ticks += 1
+            self.overruns += 1
+            if late > self.max_late_ms:
+                self.max_late_ms = late
+            self._deadline = now
+            return False
+
+        while True:
+            left = ticks_diff(deadline, now)
+            if left <= 0:
+                self.ticks += 1
+                self._deadline = deadline
+                return False
+            if self.wake is not None and self.wake():
+                self.early_wakes += 1
+                return True
+            self._sleep(min(left, self.slice_ms))
+            now = ticks_ms()
+
+    def line(self):
+        return "sched ticks=%d overruns=%d max_late=%d ms early_wakes=%d" % (
+            self.ticks, self.overruns, self.max_late_ms, self.early_wakes)
@@ -0,0 +1,56 @@
+# sim – deterministic host simulator for the Pico firmware.
+#
+# Provides stand-in machine/network/boot modules, routes time.ticks_* and
+# sleep_* to a virtual clock, and steps the unchanged main.py N ticks
+# against scripted sensor traces. Run from pico/:  python -m sim --help
+
+import os
+import sys
+import time
+import types
+
+from .clock import clock, Clock
+from .world import world
+
+PICO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_TIME_FUNCS = ("ticks_ms", "ticks_us", "ticks_cpu", "ticks_diff", "ticks_add",
+               "sleep_ms", "sleep_us")
+
+
+def install(start_ms=0, ssid="sim", pwd="sim", pc_ip="127.0.0.1"):
+    """
+    Reset the virtual board and make MicroPython-only imports resolve to
+    the stand-ins. Call before importing any firmware module.
+    """
+    from . import machine, network, micropython
+
+    clock.__init__(start_ms)
+    world.reset()
+    for name in _TIME_FUNCS:
+        setattr(time, name, getattr(clock, name))
+
+    boot = types.ModuleType("boot")
+    boot.SSID = ssid
+    boot.PWD = pwd
+    boot.PC_IP = pc_ip
+
+    sys.modules["machine"] = machine
+    sys.modules["network"] = network
+    sys.modules["micropython"] = micropython
+    sys.modules["boot"] = boot
+    if PICO_DIR not in sys.path:
+        sys.path.insert(0, PICO_DIR)
+
+
+def unload_firmware():
+    """Forget imported firmware modules so the next import boots afresh."""
+    for name, mod in list(sys.modules.items()):
+        path = getattr(mod, "__file__", None) or ""
+        if path.startswith(os.path.join(PICO_DIR, "sim") + os.sep):
+            continue
+        if path.startswith(PICO_DIR + os.sep) and not name.startswith("fuzz"):
+            del sys.modules[name]
+
+
+from .runner import Simulator, FakeBackend     # noqa: E402
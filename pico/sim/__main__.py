@@ -0,0 +1,58 @@
+# python -m sim [--ticks N] [--trace trace.json] [--async SECONDS] [--binary] [--verbose]
+#
+# Boots main.py on the virtual board, replays a sensor trace and prints
+# per-tick cost. A trace file is a JSON list of [t_ms, event, value].
+# --async runs the asyncio runtime in host real time instead (PIR
+# warm-up skipped) and reports the telemetry it produced. --binary makes
+# the fake backend accept the binary telemetry protocol.
+
+import json
+import sys
+
+from . import Simulator, world
+
+# Default scenario: switch on, let the PIR warm up, walk towards the
+# sensor and away again, drop Wi-Fi for a while, then go quiet.
+DEFAULT_TRACE = [
+    (1_000, "green", None),
+    (31_000, "pir", 1),
+    (32_000, "pir", 0),
+] + [(31_000 + i * 200, "distance", 2000 - i * 34) for i in range(50)] + [
+    (41_000, "wifi", 0),
+    (46_000, "wifi", 1),
+    (45_000, "distance", None),
+    (50_000, "pir", 1),
+    (50_500, "pir", 0),
+]
+
+
+def main(argv):
+    ticks = 600
+    trace = DEFAULT_TRACE
+    if "--ticks" in argv:
+        ticks = int(argv[argv.index("--ticks") + 1])
+    if "--trace" in argv:
+        with open(argv[argv.index("--trace") + 1]) as f:
+            trace = [tuple(e) for e in json.load(f)]
+
+    with Simulator(trace, binary="--binary" in argv, verbose="--verbose" in argv) as sim:
+        if "--async" in argv:
+            sim.run_async(int(float(argv[argv.index("--async") + 1]) * 1000))
+            print("telemetry: %d messages, %d bytes" % (len(sim.backend.lines), sim.backend.bytes_in))
+            return 0
+
+        sim.step(ticks)
+        s = sim.summary()
+        print("ticks:", s["ticks"])
+        for key in ("wall_us", "busy_us", "period_us"):
+            d = s[key]
+            print("%-10s mean %9.0f  p95 %9.0f  max %9.0f" % (key, d["mean"], d["p95"], d["max"]))
+        if sim.backend is not None:
+            print("telemetry: %d messages, %d bytes" % (len(sim.backend.lines), sim.backend.bytes_in))
+        for gpio, state in world.pwm.items():
+            print("pwm gpio%d writes: %d" % (gpio, state["writes"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,101 @@
+# sim/clock.py – virtual microsecond clock with MicroPython tick semantics.
+
+from time import perf_counter
+
+TICKS_PERIOD = 1 << 30          # MicroPython ticks wrap at 2**30.
+_TICKS_MAX = TICKS_PERIOD - 1
+_TICKS_HALF = TICKS_PERIOD // 2
+
+
+class Clock:
+    def __init__(self, start_ms=0):
+        """
+        Deterministic clock: time only moves when something sleeps or
+        blocks. start_ms lets a run begin close to a tick wrap-around.
+        """
+        self.now_us = start_ms * 1000
+        self.busy_us = 0        # Time spent in blocking calls (not sleeps).
+        self._events = []       # [(t_us, seq, fn)], kept sorted.
+        self._seq = 0
+        self.realtime = False   # Track host time (asyncio runs).
+        self._advancing = False
+        self._wall0 = 0.0
+        self._virt0 = 0
+
+    def follow_wall_clock(self):
+        """From now on, virtual time also advances with host time."""
+        self._wall0 = perf_counter()
+        self._virt0 = self.now_us
+        self.realtime = True
+
+    def _sync(self):
+        if self.realtime and not self._advancing:
+            target = self._virt0 + int((perf_counter() - self._wall0) * 1e6)
+            if target > self.now_us:
+                self.advance_us(target - self.now_us)
+
+    # ---------- MicroPython time API ----------
+    def ticks_ms(self):
+        self._sync()
+        return (self.now_us // 1000) & _TICKS_MAX
+
+    def ticks_us(self):
+        self._sync()
+        return self.now_us & _TICKS_MAX
+
+    def ticks_cpu(self):
+        return self.ticks_us()
+
+    @staticmethod
+    def ticks_diff(a, b):
+        return ((a - b + _TICKS_HALF) & _TICKS_MAX) - _TICKS_HALF
+
+    @staticmethod
+    def ticks_add(t, delta):
+        return (t + delta) & _TICKS_MAX
+
+    def sleep_ms(self, ms):
+        self.advance_us(int(ms * 1000))
+
+    def sleep_us(self, us):
+        self.block_us(us)
+
+    def sleep(self, s):
+        self.advance_us(int(s * 1_000_000))
+
+    # ---------- Simulation control ----------
+    def block_us(self, us):
+        """Advance time for a busy-wait (counted as busy time)."""
+        self.busy_us += int(us)
+        self.advance_us(us)
+
+    def advance_us(self, us):
+        """Advance time, running any events that fall due on the way."""
+        end = self.now_us + int(us)
+        nested = self._advancing
+        self._advancing = True
+        try:
+            while self._events and self._events[0][0] <= end:
+                t, _, fn = self._events.pop(0)
+                if t > self.now_us:
+                    self.now_us = t
+                fn()
+        finally:
+            self._advancing = nested
+        if end > self.now_us:
+            self.now_us = end
+
+    def at_us(self, t_us, fn):
+        """Run fn() when virtual time reaches t_us."""
+        self._seq += 1
+        self._events.append((t_us, self._seq, fn))
+        self._events.sort()
+
+    def at_ms(self, t_ms, fn):
+        self.at_us(int(t_ms * 1000), fn)
+
+    def after_us(self, delay_us, fn):
+        self.at_us(self.now_us + int(delay_us), fn)
+
+
+clock = Clock()
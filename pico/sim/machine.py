@@ -0,0 +1,119 @@
+# sim/machine.py – stand-in for MicroPython's machine module.
+
+from .clock import clock
+from .world import world
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self.mode = mode
+        if pull == Pin.PULL_UP and id not in world.levels:
+            world.levels[id] = 1
+        if value is not None:
+            self.value(value)
+
+    def value(self, v=None):
+        if v is None:
+            if self.mode == Pin.OUT:
+                return world.outputs.get(self.id, 0)
+            return world.level(self.id)
+        old = world.outputs.get(self.id, 0)
+        world.outputs[self.id] = 1 if v else 0
+        if old != world.outputs[self.id]:
+            world.output_edge(self.id, world.outputs[self.id])
+
+    def __call__(self, v=None):
+        return self.value(v)
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    high = on
+    low = off
+
+    def toggle(self):
+        self.value(0 if self.value() else 1)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False):
+        handlers = world.irqs.setdefault(self.id, [])
+        handlers[:] = [h for h in handlers if h[2] is not self]
+        if handler is not None:
+            handlers.append((trigger, handler, self))
+
+    def __repr__(self):
+        return "Pin(%d)" % self.id
+
+
+class PWM:
+    def __init__(self, pin, freq=None, duty_u16=None):
+        self.pin = pin
+        self._state = world.pwm.setdefault(pin.id, {"freq": 0, "duty_u16": 0, "writes": 0})
+        if freq is not None:
+            self.freq(freq)
+        if duty_u16 is not None:
+            self.duty_u16(duty_u16)
+
+    def freq(self, value=None):
+        if value is None:
+            return self._state["freq"]
+        self._state["freq"] = int(value)
+        self._state["writes"] += 1
+
+    def duty_u16(self, value=None):
+        if value is None:
+            return self._state["duty_u16"]
+        self._state["duty_u16"] = int(value)
+        self._state["writes"] += 1
+
+    def deinit(self):
+        self._state["duty_u16"] = 0
+
+
+def time_pulse_us(pin, pulse_level, timeout_us=1_000_000):
+    """
+    Echo pulse for the simulated ultrasonic target on this pin.
+    Blocks (in virtual time) for the echo or the timeout.
+    """
+    mm = world.distance.get(pin.id)
+    if mm is None:
+        clock.block_us(timeout_us)
+        return -1
+    pulse = int(mm / 0.1715)
+    if pulse > timeout_us:
+        clock.block_us(timeout_us)
+        return -1
+    clock.block_us(pulse)
+    return pulse
+
+
+lightsleeps = 0     # machine.lightsleep() calls.
+
+
+def lightsleep(ms=None):
+    global lightsleeps
+    lightsleeps += 1
+    clock.sleep_ms(ms or 0)
+
+
+def freq(hz=None):
+    return 125_000_000
+
+
+def reset():
+    raise SystemExit("machine.reset()")
+
+
+def unique_id():
+    return b"\x00sim\x00\x00\x00\x01"
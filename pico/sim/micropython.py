@@ -0,0 +1,12 @@
+# sim/micropython.py – stand-in for MicroPython's micropython module.
+#
+# Firmware IRQ handlers post to events.py instead of calling schedule(),
+# so only the helpers that run unchanged on the host are provided.
+
+
+def const(value):
+    return value
+
+
+def alloc_emergency_exception_buf(size):
+    pass
@@ -0,0 +1,32 @@
+# sim/network.py – stand-in for MicroPython's network module.
+
+from .world import world
+
+STA_IF = 0
+AP_IF = 1
+
+
+class WLAN:
+    def __init__(self, interface_id=STA_IF):
+        self.interface_id = interface_id
+        self._active = True
+
+    def active(self, state=None):
+        if state is None:
+            return self._active
+        self._active = bool(state)
+
+    def isconnected(self):
+        return self._active and world.wifi_up
+
+    def connect(self, ssid=None, key=None):
+        world.wifi_connects += 1
+
+    def disconnect(self):
+        pass
+
+    def ifconfig(self):
+        return ("127.0.0.1", "255.0.0.0", "127.0.0.1", "127.0.0.1")
+
+    def status(self, param=None):
+        return 3 if self.isconnected() else 0
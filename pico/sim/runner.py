@@ -0,0 +1,254 @@
+# sim/runner.py – boot main.py on the virtual board and step it.
+
+import select
+import socket as _real_socket
+import sys
+from time import perf_counter
+
+from .clock import clock
+from .world import world
+
+
+class FakeBackend:
+    """Telemetry collector standing in for the .NET data server."""
+
+    def __init__(self, port=4321, binary=False):
+        """
+        binary: accept the binary protocol when offered (the real backend
+                never does, so the Pico stays on text).
+        lines: every message rendered as a text line; messages: the decoded
+        (seq, ticks_ms, kind, value) tuples.
+        """
+        import protocol     # Firmware dir is on sys.path once install() ran.
+        self.protocol = protocol
+        self.binary = binary
+        self.srv = _real_socket.socket()
+        self.srv.setsockopt(_real_socket.SOL_SOCKET, _real_socket.SO_REUSEADDR, 1)
+        self.srv.bind(("127.0.0.1", port))
+        self.srv.listen(1)
+        self.srv.setblocking(False)
+        self.conn = None
+        self.decoder = None
+        self.lines = []
+        self.messages = []
+        self.bytes_in = 0
+
+    def poll(self):
+        """Accept and drain without blocking; completed lines land in self.lines."""
+        if self.conn is None:
+            r, _, _ = select.select([self.srv], [], [], 0)
+            if not r:
+                return
+            self.conn, _ = self.srv.accept()
+            self.conn.setblocking(False)
+            self.decoder = self.protocol.Decoder()
+        while True:
+            try:
+                data = self.conn.recv(4096)
+            except BlockingIOError:
+                return
+            except OSError:
+                data = b""
+            if not data:
+                self.conn.close()
+                self.conn = None
+                return
+            self.bytes_in += len(data)
+            offered = self.decoder.hello
+            for msg in self.decoder.feed(data):
+                self.messages.append(msg)
+                kind, value = msg[2], msg[3]
+                if kind == self.protocol.TEXT:
+                    self.lines.append(value)
+                else:
+                    self.lines.append(self.protocol.text_line(kind, value).decode().rstrip())
+            if self.binary and self.decoder.hello and not offered:
+                self.conn.send(self.protocol.ACCEPT)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+        self.srv.close()
+
+
+class TickStat:
+    __slots__ = ("t_ms", "wall_us", "busy_us", "virtual_us")
+
+    def __init__(self, t_ms, wall_us, busy_us, virtual_us):
+        self.t_ms = t_ms            # Virtual time at the start of the tick.
+        self.wall_us = wall_us      # Host CPU time spent in the tick.
+        self.busy_us = busy_us      # Virtual time in blocking calls.
+        self.virtual_us = virtual_us  # Virtual time for the whole iteration.
+
+
+class Simulator:
+    def __init__(self, trace=(), start_ms=0, trig_pin=15, echo_pin=16, pir_pin=12,
+                 green_pin=13, red_pin=14, backend=True, binary=False,
+                 cmd_port=1234, verbose=False):
+        """
+        trace: [(t_ms, event, value), ...] with events
+               "distance" (mm or None), "pir" (0/1), "green"/"red" (press),
+               "wifi" (up/down), "command" (line sent to the command server).
+        backend: run a FakeBackend on the data port to collect telemetry.
+        binary: let that backend accept the binary protocol.
+        """
+        self.trace = list(trace)
+        self.start_ms = start_ms
+        self.trig_pin = trig_pin
+        self.echo_pin = echo_pin
+        self.pir_pin = pir_pin
+        self.green_pin = green_pin
+        self.red_pin = red_pin
+        self.cmd_port = cmd_port
+        self.verbose = verbose
+        self.want_backend = backend
+        self.binary = binary
+        self.backend = None
+        self.main = None
+        self.stats = []
+        self._cmd = None
+
+    # ---------- Lifecycle ----------
+    def load(self):
+        """Install the stand-ins, schedule the trace and boot main.py."""
+        from . import install, unload_firmware, sockets
+
+        unload_firmware()
+        install(self.start_ms)
+        world.sonar[self.trig_pin] = self.echo_pin
+        for t_ms, event, value in self.trace:
+            self.schedule(t_ms, event, value)
+        if self.want_backend:
+            self.backend = FakeBackend(binary=self.binary)
+
+        saved = sys.modules.get("socket")
+        sys.modules["socket"] = sockets
+        try:
+            import log
+            log.echo = self.verbose
+            log.level = log.DEBUG if self.verbose else log.INFO
+            import main
+        finally:
+            sys.modules["socket"] = saved
+        self.main = main
+        return self
+
+    def close(self):
+        if self.main is not None:
+            try:
+                self.main.ss.close_clients()
+                if self.main.cmd_srv is not None:
+                    self.main.cmd_srv.close()
+                if self.main.sc._stream is not None:
+                    self.main.sc._stream.close()
+            except Exception:
+                pass
+        if self._cmd is not None:
+            self._cmd.close()
+            self._cmd = None
+        if self.backend is not None:
+            self.backend.close()
+            self.backend = None
+
+    def __enter__(self):
+        return self.load()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- Scripted inputs ----------
+    def schedule(self, t_ms, event, value=None):
+        clock.at_ms(t_ms, lambda: self.apply(event, value))
+
+    def apply(self, event, value=None):
+        if event == "distance":
+            world.distance[self.echo_pin] = value
+        elif event == "pir":
+            world.set_level(self.pir_pin, value)
+        elif event in ("green", "red"):
+            pin = self.green_pin if event == "green" else self.red_pin
+            world.set_level(pin, 0)
+            clock.after_us(50_000, lambda: world.set_level(pin, 1))
+        elif event == "wifi":
+            world.wifi_up = bool(value)
+        elif event == "command":
+            self.send_command(value)
+        else:
+            raise ValueError("unknown trace event: %r" % (event,))
+
+    def send_command(self, line):
+        """Send one line to the firmware's command server."""
+        if self._cmd is None:
+            self._cmd = _real_socket.create_connection(("127.0.0.1", self.cmd_port))
+        self._cmd.sendall((line + "\n").encode())
+
+    # ---------- Stepping ----------
+    def step(self, n=1):
+        """Run n main-loop iterations; returns their TickStats."""
+        out = []
+        for _ in range(n):
+            t0 = clock.now_us
+            busy0 = clock.busy_us
+            w0 = perf_counter()
+            self.main.run(1)
+            stat = TickStat(t0 // 1000, (perf_counter() - w0) * 1e6,
+                            clock.busy_us - busy0, clock.now_us - t0)
+            out.append(stat)
+            if self.backend is not None:
+                self.backend.poll()
+        self.stats.extend(out)
+        return out
+
+    def run_async(self, duration_ms, skip_warmup=True):
+        """
+        Run the asyncio runtime (runtime.py) for duration_ms of host time,
+        with the virtual clock following the host clock.
+        """
+        import asyncio
+        import runtime
+
+        if skip_warmup:
+            self.main.pir_sensor.warmup_ms = 0
+        clock.follow_wall_clock()
+
+        async def backend_poll():
+            while True:
+                if self.backend is not None:
+                    self.backend.poll()
+                await asyncio.sleep(0.02)
+
+        async def go():
+            poller = asyncio.create_task(backend_poll())
+            try:
+                await runtime.serve(port=self.cmd_port, duration_ms=duration_ms,
+                                    **self.main.runtime_tasks())
+            finally:
+                poller.cancel()
+                if self.backend is not None:
+                    self.backend.poll()
+
+        asyncio.run(go())
+
+    def run_until(self, t_ms):
+        """Step until virtual time reaches t_ms."""
+        while clock.now_us < t_ms * 1000:
+            self.step()
+
+    def summary(self, stats=None):
+        """Per-tick cost summary: {"ticks", "wall_us", "busy_us", "period_us"}."""
+        stats = self.stats if stats is None else stats
+        if not stats:
+            return {"ticks": 0}
+
+        def dist(values):
+            values = sorted(values)
+            n = len(values)
+            return {"mean": sum(values) / n, "p95": values[min(n - 1, int(n * 0.95))],
+                    "max": values[-1]}
+
+        return {
+            "ticks": len(stats),
+            "wall_us": dist([s.wall_us for s in stats]),
+            "busy_us": dist([s.busy_us for s in stats]),
+            "period_us": dist([s.virtual_us for s in stats]),
+        }
@@ -0,0 +1,37 @@
+# sim/sockets.py – CPython socket module with MicroPython stream methods.
+
+import socket as _socket
+from socket import *    # noqa: F401,F403 - re-export the full API.
+
+
+class socket(_socket.socket):
+    """CPython socket plus the read/write/readline calls the firmware uses."""
+
+    def write(self, data):
+        return self.send(data)
+
+    def read(self, n=-1):
+        return self.recv(4096 if n is None or n < 0 else n)
+
+    def readinto(self, buf):
+        """MicroPython semantics: None when a non-blocking read has no data."""
+        try:
+            return self.recv_into(buf)
+        except BlockingIOError:
+            return None
+
+    def readline(self):
+        line = b""
+        while not line.endswith(b"\n"):
+            c = self.recv(1)
+            if not c:
+                break
+            line += c
+        return line
+
+    def accept(self):
+        fd, addr = self._accept()
+        sock = socket(self.family, self.type, self.proto, fileno=fd)
+        if _socket.getdefaulttimeout() is None and self.gettimeout():
+            sock.setblocking(True)
+        return sock, addr
@@ -0,0 +1,50 @@
+# sim/world.py – shared state of the simulated board.
+
+from .clock import clock
+
+ECHO_DELAY_US = 450     # Trigger to echo rising edge on HC-SR04 style sensors.
+
+class World:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.levels = {}        # {gpio: 0/1} input levels driven by the sim.
+        self.outputs = {}       # {gpio: 0/1} levels written by firmware.
+        self.irqs = {}          # {gpio: [(trigger, handler, pin), ...]}.
+        self.distance = {}      # {echo gpio: mm or None} ultrasonic targets.
+        self.sonar = {}         # {trig gpio: echo gpio} for echo edge emulation.
+        self.pwm = {}           # {gpio: {"freq": hz, "duty_u16": v, "writes": n}}.
+        self.wifi_up = True     # Whether WLAN reports connected.
+        self.wifi_connects = 0  # WLAN.connect() calls.
+
+    def level(self, gpio, default=0):
+        return self.levels.get(gpio, self.outputs.get(gpio, default))
+
+    def output_edge(self, gpio, value):
+        """Firmware wrote an output; a falling trigger schedules echo edges."""
+        echo = self.sonar.get(gpio)
+        if echo is None or value:
+            return
+        mm = self.distance.get(echo)
+        if mm is None:
+            return
+        pulse = int(mm / 0.1715)
+        clock.after_us(ECHO_DELAY_US, lambda: self.set_level(echo, 1))
+        clock.after_us(ECHO_DELAY_US + pulse, lambda: self.set_level(echo, 0))
+
+    def set_level(self, gpio, value):
+        """Drive an input level and fire matching IRQ handlers on edges."""
+        from .machine import Pin
+        old = self.levels.get(gpio, 0)
+        value = 1 if value else 0
+        self.levels[gpio] = value
+        if old == value:
+            return
+        edge = Pin.IRQ_RISING if value else Pin.IRQ_FALLING
+        for trigger, handler, pin in list(self.irqs.get(gpio, ())):
+            if trigger & edge and handler is not None:
+                handler(pin)
+
+
+world = World()
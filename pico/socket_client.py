@@ -1,86 +1,335 @@
-# socket_client.py - simple 200 ms blocking connect with watchdog retry
-import gc
+# socket_client.py - non-blocking data link: connect state machine, batched
+# send buffer, text/binary telemetry (see protocol.py).
+import errno
+import random
+from array import array
+import select
 import socket
 import time
 
 from boot import PC_IP
-from utils import dbg
+import log
+import memory
+from telemetry_queue import TelemetryQueue, KEEP_ALERTS
+import protocol
+from protocol import TEXT, ALERT, DISTANCE, TEXT_MODE, BINARY_MODE
 
 
 DATA_HOST = PC_IP
 DATA_PORT = 4321
-_RETRY_SEC = 5  # Wait before another connection attempt.
 
-_last_try = 0
+_BACKOFF_MIN_MS = 1000      # First retry delay after a failure.
+_BACKOFF_MAX_MS = 30_000    # Retry delay cap.
+_CONNECT_TIMEOUT_MS = 3000  # Give up on a connect still in progress.
+_TX_SIZE = 512              # Outgoing bytes buffered while the link is busy.
+_TX_MSGS = 64               # Messages tracked in that buffer (re-queued on close).
+_QUEUE_SLOTS = 64           # Messages kept while disconnected (64 * 32 B RAM).
+_QUEUE_POLICY = KEEP_ALERTS
+_QUEUE_MAX_AGE_MS = 120_000 # Older messages are not replayed.
+_BATCH_BYTES = 128          # Send once this much is pending ...
+_BATCH_MS = 200             # ... or the oldest pending byte is this old (several
+                            # loop ticks, so readings share a send). Alerts go at once.
+_NEGOTIATE_MS = 2000        # Wait this long for the host to accept binary.
+
+# Link states.
+BACKOFF = 0
+CONNECTING = 1
+CONNECTED = 2
+
+_state = BACKOFF
 _stream = None
+_poller = None
+_next_try = 0               # ticks_ms of the next connect attempt.
+_backoff_ms = _BACKOFF_MIN_MS
+_connect_start = 0
+
+_tx = bytearray(_TX_SIZE)   # Pending bytes (partial writes stay here).
+_tx_len = 0
+_tx_since = 0               # ticks_ms when _tx became non-empty.
+
+# One entry per message in _tx, so unsent ones can go back to the queue.
+_RAW = 0xFF                 # Kind of bytes that are not a message (HELLO).
+_tx_end = array("H", bytes(2 * _TX_MSGS))   # End offset in _tx.
+_tx_kind = bytearray(_TX_MSGS)
+_tx_ticks = array("i", bytes(4 * _TX_MSGS))
+_tx_val = [None] * _TX_MSGS
+_tx_n = 0
+_tx_partial = False         # First entry is partly sent (not re-queued).
+
+_mode = TEXT_MODE           # Wire format of the current connection.
+_seq = 0                    # Binary frame sequence number.
+_hello_at = None            # ticks_ms HELLO was sent; None = not negotiating.
+
+# Messages waiting for the link (replayed in order on reconnect).
+queue = TelemetryQueue(slots=_QUEUE_SLOTS, policy=_QUEUE_POLICY,
+                       max_age_ms=_QUEUE_MAX_AGE_MS)
+
+_IN_PROGRESS = (errno.EINPROGRESS, errno.EAGAIN, getattr(errno, "EALREADY", errno.EAGAIN))
+
+
+def _requeue():
+    """Put whole unsent messages from _tx back at the head of the queue."""
+    global _tx_len, _tx_n, _tx_partial
+    first = 1 if _tx_partial else 0
+    for i in range(_tx_n - 1, first - 1, -1):
+        kind = _tx_kind[i]
+        if kind != _RAW:
+            queue.push_front(protocol.payload(kind, _tx_val[i]), _tx_ticks[i], kind)
+        _tx_val[i] = None
+    _tx_len = 0
+    _tx_n = 0
+    _tx_partial = False
 
 
-def _try_connect() -> bool:
-    """Attempt a blocking connection with a 200 ms timeout."""
-    global _stream, _last_try
+def _close(now, failed=True):
+    """Drop the socket and schedule the next attempt with backoff + jitter."""
+    global _state, _stream, _poller, _next_try, _backoff_ms, _hello_at
 
     if _stream is not None:
-        return True
+        try:
+            _stream.close()
+        except Exception:
+            pass
+    _stream = None
+    _poller = None
+    _requeue()
+    _hello_at = None
+    _state = BACKOFF
 
-    now = time.ticks_ms()
+    delay = _backoff_ms if failed else _BACKOFF_MIN_MS
+    jitter = random.getrandbits(16) % (delay // 2 + 1)
+    _next_try = time.ticks_add(now, delay + jitter)
+    if failed:
+        _backoff_ms = min(_backoff_ms * 2, _BACKOFF_MAX_MS)
+    memory.request()            # Collect in idle time, not on the send path.
 
-    if time.ticks_diff(now, _last_try) < _RETRY_SEC * 1000:
-        return False
 
-    s = None
+def _start_connect(now):
+    """Open a non-blocking socket and begin connecting."""
+    global _state, _stream, _poller, _connect_start
 
+    s = None
     try:
         s = socket.socket()
-        s.settimeout(0.2)
-        s.connect((DATA_HOST, DATA_PORT))
-        s.settimeout(None)
-        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-
+        s.setblocking(False)
         _stream = s
-        _last_try = now
-
-        dbg("DATA connected")
-        return True
+        _connect_start = now
+        try:
+            s.connect((DATA_HOST, DATA_PORT))
+        except OSError as ex:
+            if ex.errno not in _IN_PROGRESS:
+                raise
+        _poller = select.poll()
+        _poller.register(s, select.POLLOUT)
+        _state = CONNECTING
 
     except OSError as ex:
-        dbg("DATA connect error:", ex)
+        log.warn(log.NET, "DATA connect error:", ex)
+        _close(now)
 
-        if s is not None:
+
+def _check_connect(now):
+    """Finish a pending connect once the socket is writable, or time out."""
+    global _state, _backoff_ms, _mode, _seq, _hello_at
+
+    events = _poller.poll(0)
+    if events:
+        ev = events[0][1]
+        if ev & (select.POLLERR | select.POLLHUP):
+            log.warn(log.NET, "DATA connect failed")
+            _close(now)
+            return
+        if ev & select.POLLOUT:
             try:
-                s.close()
-            except Exception:
+                _stream.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except (OSError, AttributeError):
                 pass
+            _state = CONNECTED
+            _backoff_ms = _BACKOFF_MIN_MS
+            _mode = TEXT_MODE
+            _seq = 0
+            _hello_at = now
+            _put(protocol.HELLO, now)
+            _flush(now, force=True)
+            log.info(log.NET, "DATA connected")
+            return
 
-        _stream = None
-        _last_try = now
-        return False
+    if time.ticks_diff(now, _connect_start) > _CONNECT_TIMEOUT_MS:
+        log.warn(log.NET, "DATA connect timeout")
+        _close(now)
 
 
-def _ensure_connection():
-    """Maintain the data connection and return the active socket."""
-    _try_connect()
-    return _stream
+def _check_accept(now):
+    """Switch to binary frames if the host answered HELLO in time."""
+    global _mode, _hello_at
 
+    if time.ticks_diff(now, _hello_at) > _NEGOTIATE_MS:
+        _hello_at = None        # No answer: stay on text.
+        return
+    try:
+        reply = _stream.recv(len(protocol.ACCEPT))
+    except OSError:
+        return                  # Nothing yet.
+    if not reply:
+        log.info(log.NET, "DATA closed by host")
+        _close(now, failed=False)
+        return
+    _hello_at = None
+    if reply == protocol.ACCEPT:
+        _mode = BINARY_MODE
+        log.info(log.NET, "DATA binary protocol")
+
+
+def _track(kind, value, ticks):
+    """Record the message just written to _tx (ends at _tx_len)."""
+    global _tx_n
+    _tx_end[_tx_n] = _tx_len
+    _tx_kind[_tx_n] = kind
+    _tx_ticks[_tx_n] = ticks
+    _tx_val[_tx_n] = value
+    _tx_n += 1
 
-def write_line(msg: str) -> bool:
-    """Send one newline-terminated message, or drop it if disconnected."""
-    global _stream
 
-    if _stream is None:
+def _put(data, now, kind=_RAW, value=None, ticks=0):
+    """Append encoded bytes to the send buffer; False if they don't fit."""
+    global _tx_len, _tx_since
+
+    n = len(data)
+    if _tx_len + n > _TX_SIZE or _tx_n == _TX_MSGS:
         return False
+    if _tx_len == 0:
+        _tx_since = now
+    memoryview(_tx)[_tx_len:_tx_len + n] = data
+    _tx_len += n
+    _track(kind, value, ticks)
+    return True
+
+
+def _append(kind, value, ticks, now):
+    """Encode one message into the send buffer; False if it doesn't fit."""
+    global _tx_len, _tx_since, _seq
+
+    if _mode == TEXT_MODE:
+        return _put(protocol.text_line(kind, value), now, kind, value, ticks)
 
+    if _tx_len + protocol.frame_size(kind, value) > _TX_SIZE or _tx_n == _TX_MSGS:
+        return False
+    if _tx_len == 0:
+        _tx_since = now
+    _tx_len += protocol.pack_into(_tx, _tx_len, _seq, ticks, kind, value)
+    _seq = (_seq + 1) & 0xFFFF
+    _track(kind, value, ticks)
+    return True
+
+
+def _sent(n):
+    """Drop n sent bytes from _tx and the entries they completed."""
+    global _tx_len, _tx_n, _tx_partial
+    mv = memoryview(_tx)
+    mv[:_tx_len - n] = mv[n:_tx_len]
+    _tx_len -= n
+
+    done = 0
+    while done < _tx_n and _tx_end[done] <= n:
+        done += 1
+    _tx_partial = done < _tx_n and (done == 0 or _tx_end[done - 1] < n)
+    for i in range(done, _tx_n):
+        _tx_end[i - done] = _tx_end[i] - n
+        _tx_kind[i - done] = _tx_kind[i]
+        _tx_ticks[i - done] = _tx_ticks[i]
+        _tx_val[i - done] = _tx_val[i]
+    for i in range(_tx_n - done, _tx_n):
+        _tx_val[i] = None
+    _tx_n -= done
+
+
+def _flush(now, force=False):
+    """
+    Send as much of the pending buffer as the socket takes, never blocking.
+    Unless forced, wait until a batch is big or old enough.
+    """
+    if _state != CONNECTED or _tx_len == 0:
+        return
+    if not force and _tx_len < _BATCH_BYTES and time.ticks_diff(now, _tx_since) < _BATCH_MS:
+        return
     try:
-        _stream.write((msg + "\n").encode())
+        n = _stream.send(memoryview(_tx)[:_tx_len])
+    except OSError as ex:
+        if ex.errno == errno.EAGAIN:
+            return
+        log.warn(log.NET, "DATA send error:", ex)
+        _close(now, failed=False)
+        return
+    if n:
+        _sent(n)
+
+
+def _drain_queue(now):
+    """Move queued messages into the send buffer while they fit."""
+    while True:
+        item = queue.peek(now)
+        if item is None:
+            return
+        ticks, kind, data = item
+        value = protocol.value_of(kind, data)
+        if kind == TEXT:
+            value = bytes(value)    # data is a view into the queue slot.
+        if not _append(kind, value, ticks, now):
+            return
+        queue.pop()
+
+
+def _poll():
+    """Advance the link state machine, replay queued messages and flush."""
+    now = time.ticks_ms()
+
+    if _state == BACKOFF:
+        if time.ticks_diff(now, _next_try) >= 0:
+            _start_connect(now)
+    if _state == CONNECTING:
+        _check_connect(now)
+    if _state == CONNECTED and _hello_at is not None:
+        _check_accept(now)
+    if _state == CONNECTED:
+        if _hello_at is None:
+            _drain_queue(now)   # Replay once the wire format is settled.
+        _flush(now)
+
+
+def _ensure_connection():
+    """Maintain the data connection (never blocks); return the socket if up."""
+    _poll()
+    return _stream if _state == CONNECTED else None
+
+
+def is_connected() -> bool:
+    return _state == CONNECTED
+
+
+def _send(kind, value):
+    """Buffer one message (queue it while the link is down or backed up)."""
+    now = time.ticks_ms()
+
+    if _state == CONNECTED and len(queue) == 0 and _append(kind, value, now, now):
+        _flush(now, force=(kind == ALERT))
         return True
 
-    except OSError as ex:
-        dbg("DATA send error:", ex)
+    if not queue.push(protocol.payload(kind, value), now, kind):
+        log.debug(log.NET, "DATA queue full, dropped type", kind)
+        return False
+    return True
 
-        try:
-            _stream.close()
-        except Exception:
-            pass
 
-        _stream = None
-        gc.collect()
-        return False
\ No newline at end of file
+def send_alert(active) -> bool:
+    """Alerts are sent at once; returns False only if the message was dropped."""
+    return _send(ALERT, 1 if active else 0)
+
+
+def send_distance(mm) -> bool:
+    """Distances are batched; returns False only if the message was dropped."""
+    return _send(DISTANCE, mm)
+
+
+def write_line(msg: str) -> bool:
+    """Send a free-form text message (a TEXT frame in binary mode)."""
+    return _send(TEXT, msg.encode())
@@ -1,8 +1,8 @@
-# socket_server.py – persistent control connection.
+# socket_server.py – control connections (several clients, one poll object).
 
 import socket, select, errno, time
 import utils
-from utils import dbg
+import log
 
 
 # Ping bookkeeping (main.py reads these helpers).
@@ -20,100 +20,504 @@ def get_last_ping_time():
 # Server-socket creation (call once from main.py).
 # ------------------------------------------------#
 def make_cmd_server(port: int = 1234):
+    global _poller
     srv = socket.socket()
     srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     srv.bind(("0.0.0.0", port))
-    srv.listen(1)          # One control connection is enough.
+    srv.listen(MAX_CLIENTS)
     srv.setblocking(False)
-    dbg("CMD listening on", port)
+    _poller = select.poll()
+    _poller.register(srv, select.POLLIN)
+    _track(srv, _SERVER)
+    log.info(log.CMD, "CMD listening on", port)
     return srv
 
-# One persistent client socket.
-_sock = None
-_rx_buffer = ""
+# Command table.
+# -------------- #
+# Command name (upper case, one or two words) -> handler(arg). arg is the
+# rest of the line, upper case, as a memoryview into the receive buffer
+# (empty if none): valid only during the call, so parse it with int_arg /
+# arg_is, or copy it with bytes(arg). A handler may return a reply (str
+# or bytes), which is sent back to the client.
+_commands = []              # [name bytes, handler], compared in place by _lookup.
+_ping_led = None
+_owner = None               # Client whose command is running ...
+_send = None                # ... and its send(bytes), for LOG STREAM.
+_stream_owner = None        # Client receiving streamed log lines.
 
-# Poll each main-loop tick.
-# ------------------------ #
-def poll_command(server_sock, ping_led):
+def register(name, handler):
+    """Add or replace a command, e.g. register("SET MIN", fn)."""
+    key = name.upper().encode()
+    for entry in _commands:
+        if entry[0] == key:
+            entry[1] = handler
+            return
+    _commands.append([key, handler])
+
+
+def _same(buf, start, end, name):
+    """True if buf[start:end] equals name (compared in place)."""
+    n = len(name)
+    if end - start != n:
+        return False
+    for i in range(n):
+        if buf[start + i] != name[i]:
+            return False
+    return True
+
+
+def arg_is(arg, word):
+    """True if the argument is exactly word (bytes), e.g. arg_is(arg, b"OFF")."""
+    return _same(arg, 0, len(arg), word)
+
+
+def int_arg(arg):
+    """Decimal integer in arg, or None (no allocation)."""
+    n = len(arg)
+    neg = n > 0 and arg[0] == 45            # "-"
+    i = 1 if neg else 0
+    if i == n:
+        return None
+    v = 0
+    while i < n:
+        d = arg[i] - 48
+        if not 0 <= d <= 9:
+            return None
+        v = v * 10 + d
+        i += 1
+    return -v if neg else v
+
+
+def _cmd_start(arg):
+    utils.sys_on = True
+    log.info(log.CMD, "START => System up remotely")
+
+
+def _cmd_stop(arg):
+    utils.sys_on = False
+    log.info(log.CMD, "STOP => System down remotely")
+
+
+def _cmd_ping(arg):
+    update_ping_time()
+    if _ping_led is not None:
+        _ping_led.value(1)
+    log.debug(log.CMD, "PING received")
+
+
+def _cmd_lock(arg):
+    utils.buttons_enabled = False
+    log.info(log.CMD, "LOCK => buttons disabled")
+
+
+def _cmd_unlock(arg):
+    utils.buttons_enabled = True
+    log.info(log.CMD, "UNLOCK => buttons enabled")
+
+
+def _cmd_set_min(arg):
+    mm = int_arg(arg)
+    if mm is None or not 0 <= mm < utils.max_dist:
+        log.warn(log.CMD, "Bad SET MIN cmd:", bytes(arg))
+        return "ERR SET MIN"
+    utils.min_dist = mm
+    log.info(log.CMD, "SET MIN =>", mm, "mm")
+    return "OK MIN %d" % mm
+
+
+def _cmd_set_max(arg):
+    mm = int_arg(arg)
+    if mm is None or not utils.min_dist < mm:
+        log.warn(log.CMD, "Bad SET MAX cmd:", bytes(arg))
+        return "ERR SET MAX"
+    utils.max_dist = mm
+    log.info(log.CMD, "SET MAX =>", mm, "mm")
+    return "OK MAX %d" % mm
+
+
+def _cmd_log(arg):
+    return log.dump()[:-1] or "(log empty)"
+
+
+def _cmd_log_clear(arg):
+    log.clear()
+    return "OK"
+
+
+_LEVEL_NAMES = [(name.encode(), lvl) for name, lvl in log.LEVELS.items()]
+
+def _cmd_log_level(arg):
+    lvl = int_arg(arg)
+    for name, value in _LEVEL_NAMES:
+        if arg_is(arg, name):
+            lvl = value
+    if lvl is None:
+        return "ERR LOG LEVEL"
+    log.level = lvl
+    return "OK LEVEL %d" % lvl
+
+
+def _cmd_log_mask(arg):
+    mask = int_arg(arg)
+    if mask is None:
+        return "ERR LOG MASK"
+    log.mask = mask
+    return "OK MASK %d" % mask
+
+
+def _cmd_log_stream(arg):
+    """LOG STREAM [OFF]: copy new log lines to this client as they happen."""
+    global _stream_owner
+    if arg_is(arg, b"OFF") or _send is None:
+        log.sink = None
+        _stream_owner = None
+        return "OK STREAM OFF"
+    log.sink = _send
+    _stream_owner = _owner
+    return "OK STREAM ON"
+
+
+def client_closed(owner):
+    """Stop streaming to a client that went away."""
+    global _stream_owner
+    if owner is not None and owner is _stream_owner:
+        log.sink = None
+        _stream_owner = None
+
+
+register("START", _cmd_start)
+register("STOP", _cmd_stop)
+register("PING", _cmd_ping)
+register("LOCK", _cmd_lock)
+register("UNLOCK", _cmd_unlock)
+register("SET MIN", _cmd_set_min)
+register("SET MAX", _cmd_set_max)
+register("LOG", _cmd_log)
+register("LOG CLEAR", _cmd_log_clear)
+register("LOG LEVEL", _cmd_log_level)
+register("LOG MASK", _cmd_log_mask)
+register("LOG STREAM", _cmd_log_stream)
+
+
+# Command handling (shared by poll_command and the asyncio runtime).
+# ----------------------------------------------------------------- #
+_RX_SIZE = 128              # Longest accepted command line.
+_line = bytearray(_RX_SIZE)  # handle_command's working copy (reused).
+_line_mv = memoryview(_line)
+
+def _lookup(buf, start, end):
+    for name, fn in _commands:
+        if _same(buf, start, end, name):
+            return fn
+    return None
+
+
+def _dispatch(mv, start, end):
     """
-    Accept a connection if none is active, then read and act on
-    any command lines. Drops the socket on error and waits for the
-    next accept. Never blocks.
+    Run the command in mv[start:end] (a memoryview of a bytearray,
+    upper-cased in place). Tries the first two words as the name, then
+    the first word. Returns the reply.
     """
-    global _sock, _rx_buffer
-
-    # 1. Accept phase.
-    if _sock is None:
-        r, _, _ = select.select([server_sock], [], [], 0)
-        if r:
-            _sock, _ = server_sock.accept()
-            _sock.setblocking(False)
-            # Best-effort keep-alive.
-            opt = getattr(socket, "SO_KEEPALIVE", None)
-            if opt is not None:
-                try:
-                    _sock.setsockopt(socket.SOL_SOCKET, opt, 1)
-                except OSError:
-                    pass
+    # Trim whitespace / CR, upper-case ASCII letters in place.
+    while start < end and mv[start] <= 32:
+        start += 1
+    while end > start and mv[end - 1] <= 32:
+        end -= 1
+    if start == end:
+        return None
+    sp1 = sp2 = end
+    for i in range(start, end):
+        c = mv[i]
+        if 97 <= c <= 122:
+            mv[i] = c - 32
+        elif c == 32:
+            if sp1 == end:
+                sp1 = i
+            elif sp2 == end:
+                sp2 = i
+
+    name_end = sp2
+    fn = _lookup(mv, start, sp2)
+    if fn is None and sp1 != end:
+        name_end = sp1
+        fn = _lookup(mv, start, sp1)
+    if fn is None:
+        if log.on(log.WARN, log.CMD):
+            log.warn(log.CMD, "Unknown command:", bytes(mv[start:end]))
+        return "ERR UNKNOWN"
+    while name_end < end and mv[name_end] == 32:
+        name_end += 1
+    return fn(mv[name_end:end])
+
+
+def handle_command(raw, ping_led=None, owner=None, send=None):
+    """
+    Act on one command line (str or bytes); return the handler's reply.
+    owner/send identify the client (used by LOG STREAM). The line is
+    copied into a reused buffer, so bytes input allocates nothing.
+    """
+    global _ping_led, _owner, _send
+    if ping_led is not None:
+        _ping_led = ping_led
+    if isinstance(raw, str):
+        raw = raw.encode()
+    n = len(raw)
+    if n > _RX_SIZE:
+        log.warn(log.CMD, "CMD line too long, discarded")
+        return "ERR TOO LONG"
+    _line_mv[:n] = raw
+    _owner, _send = owner, send
+    try:
+        return _dispatch(_line_mv, 0, n)
+    finally:
+        _owner = _send = None
+
+
+def _reply(c, reply):
+    """Send a handler's reply to client c (queued if the socket is full)."""
+    if reply is None:
+        return
+    _write(c, reply.encode() + b"\n" if isinstance(reply, str) else reply + b"\n")
+
+
+# Control clients (backend, speech controller, diagnostics shell ...).
+# -------------------------------------------------------------------- #
+MAX_CLIENTS = 4             # At the cap, a new client replaces the idlest.
+IDLE_MS = 120_000           # Drop clients silent for this long.
+_TX_MAX = 4096              # Unsent reply bytes kept per client.
+
+class _Client:
+    def __init__(self):
+        self.sock = None
+        self.rx = bytearray(_RX_SIZE)   # Received bytes not yet handled.
+        self.rx_mv = memoryview(self.rx)
+        self.rx_len = 0
+        self.tx = None                  # memoryview of reply bytes not yet sent.
+        self.want_out = False           # Registered for POLLOUT (tx pending).
+        self.skip = False               # Discarding an over-long line.
+        self.last_ms = 0                # ticks_ms of the last data.
+        self.send = self.write          # Bound once (LOG STREAM sink).
+
+    def write(self, data):
+        _write(self, data)
+
+_SERVER = object()          # Poll key marker for the listening socket.
+_pool = [_Client() for _ in range(MAX_CLIENTS)]  # Buffers allocated once.
+_by_key = {}                # Poll result object -> _Client (or _SERVER).
+_poller = None
+
+
+def _track(sock, owner):
+    """Map a socket to its owner under every key poll() may report."""
+    _by_key[sock] = owner
+    try:
+        _by_key[sock.fileno()] = owner      # CPython poll() reports fds.
+    except AttributeError:
+        pass
 
-    if _sock is None:
-        return                      # No client yet.
 
-    # 2. Read phase (non-blocking).
+def _untrack(sock):
+    _by_key.pop(sock, None)
     try:
-        data = _sock.recv(64)
+        _by_key.pop(sock.fileno(), None)
+    except (AttributeError, OSError):
+        pass
+
+
+def input_ready():
+    """True if a control client sent data or is connecting (non-blocking)."""
+    if _poller is None:
+        return False
+    ipoll = getattr(_poller, "ipoll", None)     # MicroPython: no allocation.
+    for _ in (ipoll(0) if ipoll else _poller.poll(0)):
+        return True
+    return False
+
+
+def _flush(c):
+    """Send as much of c.tx as the socket takes; poll for POLLOUT while some is left."""
+    data = c.tx
+    while data:
+        try:
+            n = c.sock.send(data)
+        except OSError as ex:
+            if ex.errno == errno.EAGAIN:
+                break
+            log.warn(log.CMD, "CMD reply error:", ex)
+            _drop_client(c)
+            return
+        if not n:
+            break
+        data = data[n:]
+    c.tx = data if data else None
+    if (c.tx is not None) != c.want_out:
+        c.want_out = c.tx is not None
+        _poller.modify(c.sock, select.POLLIN | select.POLLOUT if c.want_out
+                       else select.POLLIN)
+
 
-        if not data:
-            _sock.close()
-            _sock = None
-            _rx_buffer = ""
+def _write(c, data):
+    """Send data to c; what the socket cannot take now is queued (up to _TX_MAX)."""
+    if c.sock is None:
+        return
+    if c.tx is not None:
+        if len(c.tx) + len(data) > _TX_MAX:
+            log.warn(log.CMD, "CMD reply queue full, dropped")
             return
+        data = bytes(c.tx) + data       # Only under backpressure.
+    c.tx = memoryview(data)
+    _flush(c)
+
 
-        _rx_buffer += data.decode()
-
-        while "\n" in _rx_buffer:
-            raw, _rx_buffer = _rx_buffer.split("\n", 1)
-            cmd = raw.strip().upper()
-
-            if cmd == "START":
-                utils.sys_on = True
-                dbg("START => System up remotely")
-
-            elif cmd == "STOP":
-                utils.sys_on = False
-                dbg("STOP => System down remotely")
-
-            elif cmd == "PING":
-                update_ping_time()
-                ping_led.value(1)
-                dbg("PING received")
-
-            # --- future extensions.
-            # elif cmd == "LOCK":
-            #     ut.buttons_enabled = False
-            #     dbg("LOCK => buttons disabled")
-            # elif cmd == "UNLOCK":
-            #     ut.buttons_enabled = True
-            #     dbg("UNLOCK => buttons enabled")
-            # elif cmd.startswith("SET MIN "):
-            #     try:
-            #         ut.min_dist = int(cmd.split()[2])
-            #         dbg("SET MIN =>", main.min_dist, "mm")
-            #     except (ValueError, IndexError):
-            #         dbg("Bad SET MIN cmd:", cmd)
-            # elif cmd.startswith("SET MAX "):
-            #     try:
-            #         ut.max_dist = int(cmd.split()[2])
-            #         dbg("SET MAX =>", main.max_dist, "mm")
-            #     except (ValueError, IndexError):
-            #         dbg("Bad SET MAX cmd:", cmd)
+def client_count():
+    return sum(1 for c in _pool if c.sock is not None)
 
+
+def _drop_client(c):
+    client_closed(c)
+    _untrack(c.sock)
+    try:
+        _poller.unregister(c.sock)
+    except (OSError, ValueError, KeyError):
+        pass
+    try:
+        c.sock.close()
+    except Exception:
+        pass
+    c.sock = None
+    c.rx_len = 0
+    c.tx = None
+    c.want_out = False
+    c.skip = False
+
+
+def close_clients():
+    """Disconnect every control client (shutdown / host tests)."""
+    for c in _pool:
+        if c.sock is not None:
+            _drop_client(c)
+
+
+def _accept(server_sock, now):
+    """Accept one pending connection into a free (or the idlest) slot."""
+    try:
+        sock, addr = server_sock.accept()
+    except OSError:
+        return False            # No more pending connections.
+    free = None
+    for c in _pool:
+        if c.sock is None:
+            free = c
+            break
+    if free is None:
+        free = _pool[0]
+        for c in _pool:
+            if time.ticks_diff(c.last_ms, free.last_ms) < 0:
+                free = c
+        log.warn(log.CMD, "CMD client cap reached, dropping idlest")
+        _drop_client(free)
+
+    sock.setblocking(False)
+    # Best-effort keep-alive.
+    opt = getattr(socket, "SO_KEEPALIVE", None)
+    if opt is not None:
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, opt, 1)
+        except OSError:
+            pass
+    free.sock = sock
+    free.last_ms = now
+    _poller.register(sock, select.POLLIN)
+    _track(sock, free)
+    log.info(log.CMD, "CMD client connected:", addr)
+    return True
+
+
+def _scan(c, old):
+    """Handle complete lines in c.rx; bytes from old on are new."""
+    global _owner, _send
+    rx = c.rx
+    start = 0
+    for i in range(old, c.rx_len):
+        if rx[i] == 10:         # "\n"
+            if c.skip:
+                c.skip = False
+            else:
+                _owner, _send = c, c.send
+                try:
+                    _reply(c, _dispatch(c.rx_mv, start, i))
+                finally:
+                    _owner = _send = None
+                if c.sock is None:
+                    return              # Dropped while replying.
+            start = i + 1
+
+    # Keep the unfinished tail at the front of the buffer.
+    if start:
+        mv = c.rx_mv
+        mv[:c.rx_len - start] = mv[start:c.rx_len]
+        c.rx_len -= start
+    if c.rx_len == _RX_SIZE:
+        log.warn(log.CMD, "CMD line too long, discarded")
+        c.rx_len = 0
+        c.skip = True
+
+
+def _read(c, now):
+    """Read what the client sent (non-blocking) and run complete lines."""
+    try:
+        n = c.sock.readinto(c.rx_mv[c.rx_len:])
     except OSError as ex:
         if ex.errno != errno.EAGAIN:    # Real error --> drop socket.
-            dbg("CTRL socket error:", ex)
-            try:
-                _sock.close()
-            except Exception:
-                pass
-            _sock = None
-            _rx_buffer = ""
+            log.warn(log.CMD, "CTRL socket error:", ex)
+            _drop_client(c)
+        return
+
+    if n is None:
+        return                      # Nothing received yet.
+    if n == 0:
+        _drop_client(c)             # Client closed.
+        return
+
+    c.last_ms = now
+    old = c.rx_len
+    c.rx_len += n
+    _scan(c, old)
+
+# Poll each main-loop tick.
+# ------------------------ #
+def poll_command(server_sock, ping_led):
+    """
+    Accept new control clients and act on command lines from all of
+    them, through one poll object. Never blocks.
+    """
+    global _ping_led
+    _ping_led = ping_led
+    now = time.ticks_ms()
+
+    # ipoll reuses one result tuple; accepts (which register sockets)
+    # wait until the iteration is over.
+    ipoll = getattr(_poller, "ipoll", None)     # MicroPython: no allocation.
+    incoming = False
+    for item in (ipoll(0) if ipoll else _poller.poll(0)):
+        obj, ev = item[0], item[1]
+        owner = _by_key.get(obj)
+        if owner is _SERVER:
+            incoming = True
+        elif owner is not None:
+            if ev & (select.POLLHUP | select.POLLERR):
+                _drop_client(owner)
+                continue
+            if ev & select.POLLOUT:
+                _flush(owner)
+            if ev & select.POLLIN and owner.sock is not None:
+                _read(owner, now)
+    if incoming:
+        while _accept(server_sock, now):
+            pass
+
+    # Idle timeouts.
+    for c in _pool:
+        if c.sock is not None and time.ticks_diff(now, c.last_ms) > IDLE_MS:
+            log.info(log.CMD, "CMD client idle, dropped")
+            _drop_client(c)
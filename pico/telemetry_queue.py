@@ -0,0 +1,162 @@
+# telemetry_queue.py – fixed-RAM telemetry queue, replayed on reconnect.
+#
+# Messages live in one preallocated bytearray of fixed-size slots:
+#   [ticks_ms: 4 bytes LE][kind: 1][length: 1][payload ...]
+# so a long outage can never grow the heap. Kinds and payloads are the
+# protocol.py ones, so replay can use either wire format. Only binary
+# frames carry the stored ticks_ms; replayed text lines have no timestamp.
+
+from time import ticks_ms, ticks_diff
+
+from protocol import TEXT, DISTANCE
+
+# Overflow policies.
+DROP_OLDEST = "drop-oldest"              # Evict the oldest message.
+COALESCE_DISTANCE = "coalesce-distance"  # Keep only the newest distance.
+KEEP_ALERTS = "keep-alerts"              # Evict distances before alerts.
+
+_HDR = 6
+
+
+class TelemetryQueue:
+    def __init__(self, slots=64, slot_size=32, policy=DROP_OLDEST, max_age_ms=None):
+        """
+        slots, slot_size: RAM budget is slots * slot_size bytes.
+        policy: DROP_OLDEST, COALESCE_DISTANCE or KEEP_ALERTS.
+        max_age_ms: messages older than this are discarded on replay.
+        """
+        self.slots = slots
+        self.slot_size = slot_size
+        self.policy = policy
+        self.max_age_ms = max_age_ms
+        self._buf = bytearray(slots * slot_size)
+        self._mv = memoryview(self._buf)
+        self._head = 0
+        self._count = 0
+
+        # Counters.
+        self.queued = 0
+        self.dropped = 0        # Rejected or evicted on overflow.
+        self.coalesced = 0      # Distances replaced by a newer one.
+        self.expired = 0        # Too old at replay time.
+
+    def __len__(self):
+        return self._count
+
+    # ---------- Slot helpers ----------
+    def _offset(self, i):
+        return ((self._head + i) % self.slots) * self.slot_size
+
+    def _kind(self, i):
+        return self._buf[self._offset(i) + 4]
+
+    def _find(self, kind, last=False):
+        order = range(self._count - 1, -1, -1) if last else range(self._count)
+        for i in order:
+            if self._kind(i) == kind:
+                return i
+        return -1
+
+    def _remove(self, i):
+        """Remove the i-th queued message, shifting later ones down."""
+        if i == 0:
+            self._head = (self._head + 1) % self.slots
+        else:
+            size = self.slot_size
+            for j in range(i, self._count - 1):
+                dst = self._offset(j)
+                src = self._offset(j + 1)
+                self._mv[dst:dst + size] = self._mv[src:src + size]
+        self._count -= 1
+
+    def _make_room(self, kind):
+        """Free one slot according to the policy; False = drop the new message."""
+        if self.policy == KEEP_ALERTS:
+            i = self._find(DISTANCE)
+            if i < 0:
+                if kind == DISTANCE:
+                    return False
+                i = 0
+            self._remove(i)
+        else:
+            self._remove(0)
+        self.dropped += 1
+        return True
+
+    def _store(self, i, data, t, kind):
+        o = self._offset(i)
+        b = self._buf
+        n = len(data)
+        b[o] = t & 0xFF
+        b[o + 1] = (t >> 8) & 0xFF
+        b[o + 2] = (t >> 16) & 0xFF
+        b[o + 3] = (t >> 24) & 0xFF
+        b[o + 4] = kind
+        b[o + 5] = n
+        self._mv[o + _HDR:o + _HDR + n] = data
+
+    # ---------- Public API ----------
+    def push(self, data, now=None, kind=TEXT):
+        """Queue one message payload; returns False if it was dropped."""
+        n = len(data)
+        if n > self.slot_size - _HDR:
+            self.dropped += 1
+            return False
+
+        if self.policy == COALESCE_DISTANCE and kind == DISTANCE:
+            i = self._find(DISTANCE, last=True)
+            if i >= 0:
+                self._remove(i)
+                self.coalesced += 1
+
+        if self._count == self.slots and not self._make_room(kind):
+            self.dropped += 1
+            return False
+
+        self._count += 1
+        self._store(self._count - 1, data, ticks_ms() if now is None else now, kind)
+        self.queued += 1
+        return True
+
+    def push_front(self, data, ticks, kind=TEXT):
+        """
+        Put a message back ahead of the others (e.g. sent to a link that
+        then dropped); returns False if it was dropped.
+        """
+        if len(data) > self.slot_size - _HDR:
+            self.dropped += 1
+            return False
+        if self._count == self.slots and not self._make_room(kind):
+            self.dropped += 1
+            return False
+        self._head = (self._head - 1) % self.slots
+        self._count += 1
+        self._store(0, data, ticks, kind)
+        self.queued += 1
+        return True
+
+    def peek(self, now=None):
+        """
+        Oldest non-expired message as (ticks_ms, kind, memoryview payload),
+        or None if empty. Expired messages are discarded on the way.
+        """
+        while self._count:
+            o = self._offset(0)
+            b = self._buf
+            t = b[o] | (b[o + 1] << 8) | (b[o + 2] << 16) | (b[o + 3] << 24)
+            if self.max_age_ms is not None:
+                if ticks_diff(ticks_ms() if now is None else now, t) > self.max_age_ms:
+                    self._remove(0)
+                    self.expired += 1
+                    continue
+            return t, b[o + 4], self._mv[o + _HDR:o + _HDR + b[o + 5]]
+        return None
+
+    def pop(self):
+        """Drop the oldest message (after a successful peek/send)."""
+        if self._count:
+            self._remove(0)
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
@@ -0,0 +1,803 @@
+# test.py – host-side checks: fuzzy engines, plus firmware modules on the
+# simulated board (pico/sim).
+# Run from pico/:  python test.py   (or: python -m pytest test.py)
+
+from fuzz.fuzzy_core import FuzzyCore
+from fuzz.fixed_core import FixedFuzzyCore
+from fuzz import fuzzy_config as cfg
+
+# Fixed-point output must stay this close to the float engine.
+DUTY_TOL = 2.0      # % duty.
+FREQ_TOL = 20.0     # Hz.
+
+# Distance range checked (utils.min_dist..max_dist; utils needs MicroPython).
+MIN_DIST, MAX_DIST = 100, 3000
+
+
+def _compare(rules):
+    ref = FuzzyCore(cfg.input_sets, cfg.output_sets, rules, cfg.output_ranges,
+                    defuzz_methods=cfg.defuzz_methods, sample_steps=cfg.sample_steps)
+    fixed = FixedFuzzyCore(cfg.input_sets, cfg.output_sets, rules, cfg.output_ranges,
+                           sample_steps=cfg.sample_steps)
+    for d in range(MIN_DIST, MAX_DIST + 1, 5):
+        a = ref.compute({"distance": d})
+        b = fixed.compute({"distance": d})
+        assert abs(a["duty"] - b["duty"]) <= DUTY_TOL, (d, a, b)
+        assert abs(a["freq"] - b["freq"]) <= FREQ_TOL, (d, a, b)
+
+
+def test_fixed_matches_float_mamdani():
+    _compare(cfg.mamdani_rules)
+
+
+def test_fixed_matches_float_sugeno():
+    _compare(cfg.sugeno_rules)
+
+
+def test_sugeno_skips_output_sampling():
+    core = FuzzyCore(cfg.input_sets, cfg.output_sets, cfg.sugeno_rules, cfg.output_ranges,
+                     defuzz_methods=cfg.defuzz_methods, sample_steps=cfg.sample_steps)
+    assert core.inference == "sugeno"
+    assert core._out_sets == {} and core._out_x == {} and core._out_lines == {}
+    assert core._activations == {}
+    out = core.compute({"distance": 800})
+    assert set(out) == set(cfg.output_ranges)
+
+
+def _exhaustive(core, fuzzified):
+    """Reference rule evaluation: every rule, min over its antecedents."""
+    acts = {out: {label: 0.0 for label in sets} for out, sets in core.output_sets.items()}
+    for rule in core.rules:
+        strength = min(fuzzified[var][label] for var, label in rule["if"].items())
+        for out_var, out_label in rule["then"].items():
+            acts[out_var][out_label] = max(acts[out_var][out_label], strength)
+    return acts
+
+
+def test_rule_index_matches_exhaustive():
+    from fuzz.membership import trapezoidal
+    inputs = dict(cfg.input_sets, speed={"slow": trapezoidal(0, 0, 100, 300),
+                                         "fast": trapezoidal(100, 300, 1000, 1000)})
+    rules = [{"if": {"distance": "very_close", "speed": "fast"}, "then": {"freq": "high", "duty": "high"}},
+             {"if": {"distance": "very_close", "speed": "slow"}, "then": {"freq": "medium", "duty": "high"}},
+             {"if": {"distance": "close", "speed": "fast"},      "then": {"freq": "high", "duty": "medium"}},
+             {"if": {"distance": "close"},                       "then": {"freq": "medium", "duty": "medium"}},
+             {"if": {"distance": "medium", "speed": "slow"},     "then": {"freq": "low", "duty": "low"}},
+             {"if": {"distance": "far"},                         "then": {"freq": "low", "duty": "low"}}]
+    core = FuzzyCore(inputs, cfg.output_sets, rules, cfg.output_ranges, epsilon=0,
+                     defuzz_methods=cfg.defuzz_methods, sample_steps=cfg.sample_steps)
+    for d in range(0, MAX_DIST + 1, 50):
+        for v in (0, 150, 250, 600):
+            inp = {"distance": d, "speed": v}
+            fz = core.fuzzify(inp)
+            ref = _exhaustive(core, fz)
+            acts = core.apply_rules(fz)
+            for out_var, labels in ref.items():
+                for label, mu in labels.items():
+                    assert abs(acts[out_var][label] - mu) <= 1e-6, (inp, out_var, label)
+            out = core.compute(inp)
+            expect = core.aggregate_and_defuzzify(ref)
+            for out_var in out:
+                assert abs(out[out_var] - expect[out_var]) <= 1e-3, (inp, out, expect)
+
+
+def test_rules_below_epsilon_skipped():
+    def core(eps):
+        return FuzzyCore(cfg.input_sets, cfg.output_sets, cfg.mamdani_rules, cfg.output_ranges,
+                         epsilon=eps, defuzz_methods=cfg.defuzz_methods,
+                         sample_steps=cfg.sample_steps)
+    fz = core(0).fuzzify({"distance": 1300})
+    assert 0 < fz["distance"]["far"] < 0.1 < fz["distance"]["medium"]
+
+    exact, pruned = core(0), core(0.1)
+    assert sorted(exact._fired[i] for i in range(exact._fire(fz))) == [0, 1, 2, 3]
+    assert sorted(pruned._fired[i] for i in range(pruned._fire(fz))) == [1, 2]
+    assert exact.apply_rules(fz)["freq"]["low"] > 0
+    assert pruned.apply_rules(fz)["freq"]["low"] == 0   # Only "far" drives it.
+
+
+def test_lookup_table_tracks_exact_pipeline():
+    exact = FuzzyCore(cfg.input_sets, cfg.output_sets, cfg.mamdani_rules, cfg.output_ranges,
+                      defuzz_methods=cfg.defuzz_methods, sample_steps=cfg.sample_steps)
+    lut = FuzzyCore(cfg.input_sets, cfg.output_sets, cfg.mamdani_rules, cfg.output_ranges,
+                    lut_range=(MIN_DIST, MAX_DIST), lut_step=20,
+                    defuzz_methods=cfg.defuzz_methods, sample_steps=cfg.sample_steps)
+    assert set(lut.lut_error) == {"duty", "freq"}
+    assert lut.lut_error["freq"] > 3.4          # Worst case is off the midpoints (2.87 there).
+    for d in range(MIN_DIST, MAX_DIST + 1, 7):
+        a = exact.compute({"distance": d})
+        b = lut.compute({"distance": d})
+        for out_var in a:
+            assert abs(a[out_var] - b[out_var]) <= lut.lut_error[out_var] + 1e-6, (d, a, b)
+    assert lut.compute({"distance": MAX_DIST + 500}) == lut.compute({"distance": MAX_DIST + 20})
+
+
+def test_analytic_centroid_is_exact():
+    from fuzz.membership import triangular, trapezoidal
+    inputs = {"x": {"a": triangular(0, 10, 20)}}
+    outputs = {"y": {"low": trapezoidal(0, 0, 20, 40)}}
+    rules = [{"if": {"x": "a"}, "then": {"y": "low"}}]
+    core = FuzzyCore(inputs, outputs, rules, {"y": (0, 100)},
+                     defuzz_methods={"y": "analytic"})
+    assert "y" in core._out_lines
+    # Clipped at 0.5: flat to 30, then down to 0 at 40; area 17.5, moment 925/3.
+    assert abs(core.compute({"x": 5})["y"] - 925 / 3 / 17.5) < 1e-3
+    # Full strength: area 30, moment 1400/3.
+    assert abs(core.compute({"x": 10})["y"] - 1400 / 90) < 1e-3
+
+
+def test_analytic_matches_sampled_centroid():
+    analytic = FuzzyCore(cfg.input_sets, cfg.output_sets, cfg.mamdani_rules, cfg.output_ranges,
+                         defuzz_methods={"duty": "analytic"})
+    sampled = FuzzyCore(cfg.input_sets, cfg.output_sets, cfg.mamdani_rules, cfg.output_ranges,
+                        defuzz_methods={"duty": "sampled"}, sample_steps={"duty": 1})
+    for d in range(MIN_DIST, MAX_DIST + 1, 7):
+        a = analytic.compute({"distance": d})["duty"]
+        b = sampled.compute({"distance": d})["duty"]
+        assert abs(a - b) <= 0.5, (d, a, b)     # Sampling error at 1 % steps.
+
+
+def test_result_cache_lru():
+    core = FuzzyCore(cfg.input_sets, cfg.output_sets, cfg.mamdani_rules, cfg.output_ranges,
+                     defuzz_methods=cfg.defuzz_methods, sample_steps=cfg.sample_steps,
+                     cache_size=2, cache_bucket=5)
+    a = core.compute({"distance": 1000})
+    assert core.compute({"distance": 1004}) is a        # Same 5 mm bucket.
+    core.compute({"distance": 1500})
+    core.compute({"distance": 1000})                    # Now most recently used.
+    core.compute({"distance": 2000})                    # Evicts the 1500 bucket.
+    assert (core.cache_hits, core.cache_misses) == (2, 3)
+    assert core.compute({"distance": 1000}) is a
+    core.compute({"distance": 1500})
+    assert (core.cache_hits, core.cache_misses) == (3, 4)
+
+
+def test_fixed_centroid_stays_in_small_ints():
+    from fuzz import fixed_core
+    fine = {"freq": 1}                          # 1 Hz grid: 1901 samples.
+    fixed = FixedFuzzyCore(cfg.input_sets, cfg.output_sets, cfg.mamdani_rules,
+                           cfg.output_ranges, sample_steps=fine)
+    ref = FuzzyCore(cfg.input_sets, cfg.output_sets, cfg.mamdani_rules, cfg.output_ranges,
+                    defuzz_methods={"freq": "sampled"}, sample_steps=fine)
+    for out in fixed._outputs:
+        assert out[2] == 1
+        assert fixed_core._centroid_bound(cfg.output_ranges[out[0]][1] - out[1], 1) < fixed_core._SMALL_INT
+    for d in range(MIN_DIST, MAX_DIST + 1, 25):
+        assert abs(ref.compute({"distance": d})["freq"] - fixed.compute({"distance": d})["freq"]) <= FREQ_TOL
+
+    wide = dict(cfg.output_ranges, freq=(100, 8000))
+    fixed = FixedFuzzyCore(cfg.input_sets, cfg.output_sets, cfg.mamdani_rules, wide, sample_steps=fine)
+    step = [out[2] for out in fixed._outputs if out[0] == "freq"][0]
+    assert step > 1 and fixed_core._centroid_bound(7900, step) < fixed_core._SMALL_INT
+
+
+def test_fixed_missing_input_is_safe():
+    fixed = FixedFuzzyCore(cfg.input_sets, cfg.output_sets, cfg.rules, cfg.output_ranges,
+                           sample_steps=cfg.sample_steps)
+    out = fixed.compute({"distance": None})
+    for out_var, (out_min, _) in cfg.output_ranges.items():
+        assert out[out_var] == out_min
+
+
+# Firmware modules on the simulated board.
+# ---------------------------------------- #
+def _board():
+    """Fresh virtual board; firmware modules import against its stand-ins."""
+    import sim
+    sim.unload_firmware()
+    sim.install()
+    return sim
+
+
+def test_ultrasonic_irq_discards_stale_ping():
+    sim = _board()
+    from input.sensors import Ultrasonic
+    sim.world.sonar[15] = 16
+    sim.world.distance[16] = 800
+    u = Ultrasonic(15, 16, max_distance_mm=3000, mode="irq")
+    assert abs(u.read() - 800) <= 2         # First read measures at once.
+
+    sim.world.distance[16] = 1500
+    sim.clock.sleep_ms(5000)                # Idle gap: in-flight result is stale.
+    assert abs(u.read() - 1500) <= 2
+
+
+def test_pwm_skips_redundant_writes():
+    sim = _board()
+    from output.pwm import PWM
+    pwm = PWM(28, freq=1000, duty=0, freq_hysteresis=10, duty_hysteresis=1)
+    hw = sim.world.pwm[28]
+    writes, hw_writes = pwm.writes, hw["writes"]
+
+    pwm.update(freq=1000, duty=0)               # Identical: nothing written.
+    assert (pwm.writes, hw["writes"]) == (writes, hw_writes)
+    assert pwm.skipped == 2
+
+    pwm.update(freq=1005, duty=0.5)             # Inside both hysteresis bands.
+    assert pwm.writes == writes and pwm.skipped == 4 and hw["freq"] == 1000
+
+    pwm.update(freq=1500, duty=50)
+    assert pwm.writes == writes + 2 and hw["writes"] == hw_writes + 2
+    assert hw["freq"] == 1500 and hw["duty_u16"] == 50 * 65535 // 100
+
+    pwm.update(duty=50.5)
+    pwm.off()                                   # 0 always lands exactly.
+    assert hw["duty_u16"] == 0 and pwm.skipped == 5
+
+
+def test_pwm_slew_limits_each_update():
+    sim = _board()
+    from output.pwm import PWM
+    pwm = PWM(28, freq=400, duty=0, max_freq_step=100, max_duty_step=10)
+    hw = sim.world.pwm[28]
+    freqs, duties = [], []
+    for _ in range(8):
+        pwm.update(freq=1000, duty=35)
+        freqs.append(hw["freq"])
+        duties.append(hw["duty_u16"])
+    step = 10 * 65535 // 100
+    assert freqs == [500, 600, 700, 800, 900, 1000, 1000, 1000]
+    assert duties[:4] == [step, 2 * step, 3 * step, 35 * 65535 // 100]
+    assert duties[3:] == [duties[3]] * 5
+    assert pwm.skipped == 2 + 4                 # Freq / duty at target: no rewrites.
+
+
+def _replay(q, now):
+    import protocol as p
+    out = []
+    while True:
+        item = q.peek(now)
+        if item is None:
+            return out
+        t, kind, data = item
+        out.append((t, kind, p.value_of(kind, bytes(data))))
+        q.pop()
+
+
+def test_telemetry_queue_policies():
+    _board()
+    import protocol as p
+    from telemetry_queue import TelemetryQueue, DROP_OLDEST, COALESCE_DISTANCE, KEEP_ALERTS
+
+    def fill(policy, **kw):
+        q = TelemetryQueue(slots=3, policy=policy, **kw)
+        q.push(p.payload(p.ALERT, 1), 10, p.ALERT)
+        q.push(p.payload(p.DISTANCE, 900), 20, p.DISTANCE)
+        q.push(p.payload(p.DISTANCE, 800), 30, p.DISTANCE)
+        q.push(p.payload(p.ALERT, 0), 40, p.ALERT)
+        return q
+
+    q = fill(DROP_OLDEST)
+    assert _replay(q, 50) == [(20, p.DISTANCE, 900), (30, p.DISTANCE, 800), (40, p.ALERT, 0)]
+    assert q.dropped == 1 and len(q) == 0
+
+    q = fill(COALESCE_DISTANCE)
+    assert _replay(q, 50) == [(10, p.ALERT, 1), (30, p.DISTANCE, 800), (40, p.ALERT, 0)]
+    assert q.coalesced == 1 and q.dropped == 0
+
+    q = fill(KEEP_ALERTS)
+    assert _replay(q, 50) == [(10, p.ALERT, 1), (30, p.DISTANCE, 800), (40, p.ALERT, 0)]
+    q = TelemetryQueue(slots=2, policy=KEEP_ALERTS)
+    q.push(p.payload(p.ALERT, 1), 10, p.ALERT)
+    q.push(p.payload(p.ALERT, 0), 20, p.ALERT)
+    assert not q.push(p.payload(p.DISTANCE, 700), 30, p.DISTANCE)  # Alerts win.
+    assert [m[1] for m in _replay(q, 40)] == [p.ALERT, p.ALERT]
+
+    q = fill(DROP_OLDEST, max_age_ms=25)
+    assert _replay(q, 50) == [(30, p.DISTANCE, 800), (40, p.ALERT, 0)]
+    assert q.expired == 1
+    assert not TelemetryQueue(slots=2, slot_size=8).push(b"too long", 0)
+
+
+class _Stream:
+    """Data socket stand-in: send() takes at most `room` bytes."""
+    def __init__(self, room=0):
+        self.room = room
+        self.sent = b""
+
+    def send(self, data):
+        n = min(len(data), self.room)
+        self.room -= n
+        self.sent += bytes(data[:n])
+        return n
+
+    def close(self):
+        pass
+
+
+def _link(room=0):
+    _board()
+    import socket_client as sc
+    sc._state, sc._stream, sc._hello_at = sc.CONNECTED, _Stream(room), None
+    return sc
+
+
+def test_close_requeues_unsent_messages():
+    import protocol as p
+    sc = _link(room=3)                          # "distance: 500\n" is cut after 3 bytes.
+    sc.queue.push(p.payload(p.DISTANCE, 700), 0, p.DISTANCE)   # Newer, still queued.
+    for mm in (500, 600):
+        sc._append(p.DISTANCE, mm, 10, 10)
+    sc._append(p.ALERT, 1, 5, 5)
+    sc._put(b"x\n", 5)                         # Not a message: never re-queued.
+    sc._flush(0, force=True)
+    assert sc._tx_partial and sc._stream.sent == b"dis"
+    sc._close(20, failed=False)
+    assert sc._tx_len == 0 and sc._tx_n == 0
+    assert _replay(sc.queue, 20) == [(10, p.DISTANCE, 600), (5, p.ALERT, 1),
+                                     (0, p.DISTANCE, 700)]
+
+
+def test_partial_send_keeps_the_rest():
+    import protocol as p
+    sc = _link(room=5)
+    sc._append(p.DISTANCE, 500, 0, 0)
+    sc._append(p.ALERT, 1, 0, 0)
+    sc._flush(0, force=True)
+    assert sc._stream.sent == b"dista"
+    assert bytes(sc._tx[:sc._tx_len]) == b"nce: 500\nalert: 1\n"
+    assert sc._tx_n == 2 and sc._tx_partial
+    sc._stream.room = 100
+    sc._flush(0, force=True)
+    assert sc._stream.sent == b"distance: 500\nalert: 1\n"
+    assert sc._tx_len == 0 and sc._tx_n == 0 and not sc._tx_partial
+
+
+class _Poller:
+    """select.poll stand-in reporting fixed events."""
+    def __init__(self, events=()):
+        self.events = list(events)
+
+    def poll(self, timeout=-1):
+        return self.events
+
+
+def test_connect_timeout_and_backoff():
+    sc = _link()
+    sc._state, sc._poller, sc._connect_start = sc.CONNECTING, _Poller(), 0
+    sc._check_connect(sc._CONNECT_TIMEOUT_MS)           # Still in progress.
+    assert sc._state == sc.CONNECTING
+    sc._check_connect(sc._CONNECT_TIMEOUT_MS + 1)
+    assert sc._state == sc.BACKOFF and sc._stream is None
+
+    # Each failure doubles the delay up to the cap, plus up to 50 % jitter.
+    delay = sc._BACKOFF_MIN_MS * 2                      # The timeout used the first.
+    for now in range(0, 12_000, 1000):
+        sc._close(now)
+        assert delay <= sc._next_try - now <= delay + delay // 2
+        delay = min(delay * 2, sc._BACKOFF_MAX_MS)
+    assert sc._backoff_ms == sc._BACKOFF_MAX_MS
+    sc._close(0, failed=False)                          # Clean close: short retry.
+    assert sc._next_try <= sc._BACKOFF_MIN_MS * 3 // 2
+
+    # A connect that completes resets the backoff.
+    sc._state, sc._stream = sc.CONNECTING, _Stream(100)
+    sc._poller = _Poller([(sc._stream, sc.select.POLLOUT)])
+    sc._check_connect(0)
+    assert sc._state == sc.CONNECTED and sc._backoff_ms == sc._BACKOFF_MIN_MS
+
+
+def test_publisher_deadband_and_heartbeat():
+    _board()
+    from publisher import Publisher
+    pub = Publisher(deadband=20, deadband_rel=0.02, min_interval_ms=100, max_interval_ms=1000)
+    assert pub.should_send(1000, 0)             # First value goes out at once.
+    assert not pub.should_send(1100, 50)        # Rate limit.
+    assert not pub.should_send(1015, 200)       # Inside max(20, 2 % of 1000).
+    assert pub.should_send(979, 300)            # Moved 21 mm.
+    assert not pub.should_send(979, 1200)
+    assert pub.should_send(979, 1300)           # Heartbeat after max_interval_ms.
+    assert (pub.published, pub.rate_limited, pub.suppressed) == (3, 1, 2)
+    pub.reset()
+    assert pub.should_send(979, 1310)           # reset(): next value is sent.
+
+
+def test_protocol_decoder_round_trip():
+    import protocol as p
+    buf = bytearray(64)
+    n = p.pack_into(buf, 0, 7, 123456, p.DISTANCE, 1234)
+    n += p.pack_into(buf, n, 8, 123460, p.ALERT, 1)
+    n += p.pack_into(buf, n, 9, 123470, p.TEXT, b"stats: ok")
+    frames = bytes(buf[:n])
+
+    d = p.Decoder()
+    out = d.feed(p.HELLO + b"distance: 55\nalert: 1\n" + frames)
+    assert d.hello
+    assert out == [(None, None, p.DISTANCE, 55), (None, None, p.ALERT, 1),
+                   (7, 123456, p.DISTANCE, 1234), (8, 123460, p.ALERT, 1),
+                   (9, 123470, p.TEXT, "stats: ok")]
+    assert d.lost == 0
+    assert p.Decoder().feed(p.ACCEPT) == [(None, None, p.TEXT, "proto: bin1")]
+
+    # Split frames: nothing until each frame is complete.
+    d = p.Decoder()
+    out = []
+    for i in range(len(frames)):
+        out += d.feed(frames[i:i + 1])
+    assert [m[0] for m in out] == [7, 8, 9]
+
+    # Over-long text is truncated to the one-byte length field, not an error.
+    big = bytearray(p.HEADER_SIZE + 300)
+    n = p.pack_into(big, 0, 10, 0, p.TEXT, b"x" * 300)
+    assert n == p.frame_size(p.TEXT, b"x" * 300) == p.HEADER_SIZE + p.MAX_TEXT
+    assert d.feed(bytes(big[:n])) == [(10, 0, p.TEXT, "x" * p.MAX_TEXT)]
+
+    # Sequence gaps are counted.
+    d.feed(bytes(buf[:p.pack_into(buf, 0, 13, 0, p.ALERT, 0)]))
+    assert d.lost == 2
+
+    # Bad magic is not a frame (read as text up to a newline); bad version raises.
+    bad = bytearray(frames[:12])
+    bad[0] = 0x5A
+    assert p.Decoder().feed(bytes(bad)) == []
+    bad[0] = p.MAGIC
+    bad[1] = p.VERSION + 1
+    try:
+        p.Decoder().feed(bytes(bad))
+        assert False, "version not checked"
+    except ValueError:
+        pass
+
+
+def test_events_run_only_from_drain():
+    _board()
+    import events
+    seen = []
+    events.subscribe(events.RED, lambda ev, t: seen.append(t))
+    events.post(events.RED, 10)
+    events.post(events.RED, 20)
+    assert seen == [] and events.pending() == 2     # IRQ side only records.
+    assert events.drain() == 2 and seen == [10, 20]
+
+    for t in range(events.SIZE + 5):
+        events.post(events.RED, t)
+    assert events.pending() == events.SIZE - 1 and events.overflows == 6
+    events.drain()
+    assert events.pending() == 0
+
+
+def test_filter_velocity_zero_is_used():
+    _board()
+    from input.interaction import MotionDistanceManager
+
+    class Sensor:
+        def __init__(self, filt):
+            self.filter = filt
+
+        def velocity(self):
+            return 0 if self.filter is not None else 999
+
+    m = MotionDistanceManager(None, Sensor(filt=object()))
+    m._velocity(1000, 0)
+    assert m._velocity(500, 100) == 0       # Filter says stationary.
+    m = MotionDistanceManager(None, Sensor(filt=None))
+    m._velocity(1000, 0)
+    assert m._velocity(500, 100) == -5000   # Finite difference without one.
+
+
+def test_stream_filters():
+    import random
+    _board()
+    from input.filters import MedianFilter, EMAFilter, KalmanFilter
+
+    rng = random.Random(7)
+    readings = [rng.randrange(100, 3000) for _ in range(200)]
+    f = MedianFilter(size=5)
+    for i, r in enumerate(readings):
+        window = sorted(readings[max(0, i - 4):i + 1])
+        n = len(window)
+        mid = window[n // 2] if n % 2 else (window[n // 2 - 1] + window[n // 2]) / 2
+        assert f.update(r, now=i) == int(mid + 0.5), (i, window)
+
+    f, ema = EMAFilter(alpha=0.25), None
+    for i, r in enumerate(readings):
+        ema = r if ema is None else ema + 0.25 * (r - ema)
+        assert f.update(r, now=i) == int(ema + 0.5)
+
+    f = KalmanFilter()
+    for i in range(50):
+        f.update(1000 + (40 if i % 2 else -40), now=i)      # Noise around 1000.
+    assert abs(f.value - 1000) <= 10
+
+    # max_misses: hold the last value, then start over.
+    for f in (MedianFilter(), EMAFilter(), KalmanFilter()):
+        f.update(1000, now=0)
+        f.update(1000, now=100)
+        assert f.update(None) == 1000 and f.update(None) == 1000
+        assert f.update(None) is None and f.velocity() == 0
+        assert f.update(500, now=200) == 500                # No memory of 1000.
+
+    # velocity() on a ramp: 10 mm per 100 ms.
+    for step in (-10, 10):
+        f = MedianFilter(size=3)
+        for i in range(20):
+            f.update(2000 + step * i, now=i * 100)
+        assert f.velocity() == step * 10
+
+
+def test_profiler_percentile_and_reset():
+    import random
+    _board()
+    import profiler
+
+    st = profiler.Stage("t")
+    assert st.percentile(95) == 0 and st.mean() == 0
+    for us in [10] * 90 + [1000] * 5 + [5000] * 5:
+        st.add(us)
+    assert st.percentile(50) == 15          # Upper bound of [8, 16).
+    assert st.percentile(95) == 1023        # Upper bound of [512, 1024).
+    assert st.percentile(99) == 5000        # Capped at the max seen.
+    assert (st.count, st.min, st.max, st.mean()) == (100, 10, 5000, 309)
+
+    # Against sorted samples: never below the true value, less than 2x above.
+    rng = random.Random(3)
+    samples = [rng.randrange(1, 40_000) for _ in range(500)]
+    st = profiler.stage("rand")
+    for us in samples:
+        st.add(us)
+    samples.sort()
+    for pct in (50, 90, 95, 99):
+        true = samples[(len(samples) * pct + 99) // 100 - 1]
+        assert true <= st.percentile(pct) < 2 * true, pct
+
+    profiler.reset()
+    assert (st.count, st.min, st.max, st.mean(), st.percentile(95)) == (0, 0, 0, 0, 0)
+    assert sum(st.hist) == 0
+
+
+def test_log_ring_wraps_and_evicts_whole_lines():
+    _board()
+    import log
+
+    log.SIZE, log._buf = 64, bytearray(64)
+    log.clear()
+    log.debug(log.MAIN, "hidden")                       # Below level: not stored.
+    assert log.dump() == b""
+
+    lines = []
+    for i in range(20):
+        log.info(log.MAIN, "line", i)
+        lines.append(b"0 I main: line %d\n" % i)
+        kept = log.dump()
+        assert len(kept) <= log.SIZE
+        assert kept == b"".join(lines[-kept.count(b"\n"):])    # Newest, whole, in order.
+        assert log.dropped == len(lines) - kept.count(b"\n")
+    assert log._start + log._len > log.SIZE              # Ends wrapped around.
+
+    log.warn(log.NET, "x" * 100)                         # Longer than the ring.
+    assert log.dump() == (b"0 W net: " + b"x" * 100 + b"\n")[-log.SIZE:]
+
+
+def test_memory_request_collects_when_idle():
+    _board()
+    import memory
+    memory.setup(1 << 20)
+    assert not memory.maintain()
+    memory.request()
+    assert not memory.maintain(slack_ms=1)      # Not enough idle time yet.
+    assert memory.maintain(slack_ms=50)
+    assert not memory.maintain()                # Request consumed.
+    assert memory.collections == 1
+
+
+def test_pir_ignored_while_system_off():
+    from sim import Simulator
+    trace = [(35_000, "pir", 1), (35_500, "pir", 0),    # Motion while OFF ...
+             (40_000, "green", None)]                   # ... then START.
+    with Simulator(trace) as sim:
+        sim.run_until(45_000)
+        assert "alert: 1" not in sim.backend.lines
+        sim.apply("pir", 1)                             # Motion while ON.
+        sim.run_until(46_000)
+        assert sim.backend.lines[:1] == ["alert: 1"]
+
+
+def test_still_target_heartbeat_beats_dashboard_window():
+    from sim import Simulator
+    trace = [(1_000, "green", None), (31_000, "pir", 1), (31_000, "distance", 1200)]
+    with Simulator(trace) as sim:
+        sim.run_until(33_000)
+        n = len(sim.backend.lines)
+        sim.run_until(43_000)                   # 10 s, target not moving.
+        beats = sim.backend.lines[n:]
+        assert len(beats) >= 9 and set(beats) == {"distance: 1199"}
+
+
+def test_reading_below_min_published_as_measured():
+    from sim import Simulator
+    trace = [(1_000, "green", None), (1_000, "command", "SET MIN 500"),
+             (31_000, "pir", 1), (31_000, "distance", 300)]
+    with Simulator(trace) as sim:
+        sim.run_until(33_000)
+        assert sim.backend.lines[-1] == "distance: 299"     # Not clamped to 500.
+
+
+def test_backlog_replayed_in_negotiated_format():
+    from sim import Simulator, FakeBackend
+    trace = [(1_000, "green", None), (31_000, "pir", 1), (31_000, "distance", 1200)]
+    with Simulator(trace, backend=False) as sim:
+        sim.run_until(35_000)                   # No host yet: messages queue up.
+        sim.backend = FakeBackend(binary=True)
+        sim.run_until(45_000)
+        first = sim.backend.messages[:3]
+        assert [m[2:] for m in first] == [(1, 1), (2, 1199), (2, 1199)]
+        assert first[0][1] < 35_000             # Original timestamps kept.
+
+
+def test_readings_share_sends_across_ticks():
+    from sim import Simulator
+    trace = [(1_000, "green", None), (31_000, "pir", 1)] + [
+        (31_000 + i * 100, "distance", 2000 - i * 30) for i in range(50)]   # Approaching.
+    with Simulator(trace) as sim:
+        sim.run_until(32_000)
+        stream = sim.main.sc._stream
+        sends = []
+        real_send = stream.send
+
+        def send(data):
+            sends.append(len(data))
+            return real_send(data)
+
+        stream.send = send
+        n = len(sim.backend.lines)
+        sim.run_until(36_000)
+        assert len(sends) * 3 // 2 <= len(sim.backend.lines) - n     # >= 1.5 messages/send.
+
+
+def test_early_wake_skips_control():
+    from sim import Simulator
+    trace = [(1_000, "green", None), (31_000, "pir", 1), (31_000, "distance", 1200)]
+    trace += [(33_000 + i * 70, "command", "PING") for i in range(20)]
+    with Simulator(trace) as sim:
+        sim.run_until(32_000)
+        main = sim.main
+        calls = []
+        control = main.control
+        main.control = lambda: calls.append(main.ticks_ms()) or control()
+        wakes = main.sched.early_wakes
+        sim.run_until(35_000)
+        assert main.sched.early_wakes > wakes
+        gaps = [b - a for a, b in zip(calls, calls[1:])]
+        assert min(gaps) >= main.manager.min_period_ms     # Control only at deadlines.
+
+
+def test_command_dispatch():
+    _board()
+    import socket_server as ss
+    import utils
+    import log
+    seen = []
+    ss.register("PROBE", lambda arg: seen.append((type(arg), bytes(arg))))
+    assert ss.handle_command("probe  some arg\r\n") is None
+    assert seen == [(memoryview, b"SOME ARG")]
+
+    utils.max_dist = 3000
+    assert ss.handle_command(b"set min 250") == "OK MIN 250"
+    assert utils.min_dist == 250
+    assert ss.handle_command("SET MIN x") == "ERR SET MIN"
+    assert ss.handle_command("SET MIN -5") == "ERR SET MIN"
+    assert ss.handle_command("log level debug") == "OK LEVEL %d" % log.DEBUG
+    assert ss.handle_command("LOG LEVEL 30") == "OK LEVEL 30"
+    assert ss.handle_command("FROB 1") == "ERR UNKNOWN"
+    assert ss.handle_command("   ") is None
+    assert ss.int_arg(b"-12") == -12 and ss.int_arg(b"-") is None and ss.int_arg(b"") is None
+
+
+class _IPoller:
+    """MicroPython-style poll: ipoll() yields one reused entry."""
+    def __init__(self, poller):
+        self._p = poller
+        self.register, self.unregister, self.modify = poller.register, poller.unregister, poller.modify
+        self.calls = 0
+
+    def poll(self, timeout=-1):
+        raise AssertionError("poll() used where ipoll() is available")
+
+    def ipoll(self, timeout=-1):
+        self.calls += 1
+        entry = [None, 0]
+        for obj, ev in self._p.poll(timeout):
+            entry[0], entry[1] = obj, ev
+            yield entry
+
+
+def _command_round_trip(micropython_poll):
+    import socket
+    import sys
+    from sim import sockets
+    _board()
+    sys.modules["socket"] = sockets         # MicroPython stream methods.
+    try:
+        import socket_server as ss
+    finally:
+        sys.modules["socket"] = socket
+    srv = ss.make_cmd_server(0)
+    if micropython_poll:
+        ss._poller = _IPoller(ss._poller)
+    cli = socket.create_connection(srv.getsockname())
+    try:
+        cli.sendall(b"PING\nSET MAX 2500\nnope\n")
+        cli.settimeout(1)
+        got = b""
+        for _ in range(50):
+            ss.poll_command(srv, None)
+            try:
+                got += cli.recv(4096)
+            except socket.timeout:
+                pass
+            if got.count(b"\n") >= 2:
+                break
+        assert got == b"OK MAX 2500\nERR UNKNOWN\n", got
+        assert ss.client_count() == 1
+        assert not micropython_poll or ss._poller.calls
+    finally:
+        cli.close()
+        ss.close_clients()
+        srv.close()
+
+
+def test_command_server_replies():
+    _command_round_trip(False)
+    _command_round_trip(True)
+
+
+def test_runtime_evicts_idlest_client():
+    import asyncio
+    sim = _board()
+    import runtime
+    import socket_server as ss
+
+    async def scenario():
+        server = await asyncio.start_server(
+            lambda r, w: runtime._client(r, w, None), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        conns = []
+        for i in range(ss.MAX_CLIENTS):
+            conns.append(await asyncio.open_connection("127.0.0.1", port))
+            await asyncio.sleep(0.02)
+            sim.clock.sleep_ms(100)
+        for _, w in conns[1:]:              # Client 0 stays the idlest.
+            w.write(b"PING\n")
+        await asyncio.sleep(0.05)
+        assert len(runtime._clients) == ss.MAX_CLIENTS
+
+        extra = await asyncio.open_connection("127.0.0.1", port)
+        assert await asyncio.wait_for(conns[0][0].read(), 1) == b""
+        await asyncio.sleep(0.05)
+        assert len(runtime._clients) == ss.MAX_CLIENTS
+        extra[1].write(b"SET MAX 2000\n")
+        assert await asyncio.wait_for(extra[0].readline(), 1) == b"OK MAX 2000\n"
+
+        for _, w in conns + [extra]:
+            w.close()
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(scenario())
+
+
+def test_runtime_discards_overlong_line():
+    import asyncio
+    _board()
+    import runtime
+    import socket_server as ss
+
+    async def scenario():
+        server = await asyncio.start_server(
+            lambda r, w: runtime._client(r, w, None), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        r, w = await asyncio.open_connection("127.0.0.1", port)
+        w.write(b"SET MAX " + b"9" * (ss._RX_SIZE * 8) + b"\nSET MAX 1500\n")
+        assert await asyncio.wait_for(r.readline(), 1) == b"OK MAX 1500\n"
+        w.close()
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print("ok", name)
@@ -1,64 +1,79 @@
 from time import ticks_ms, ticks_diff
+import events
+import log
 
 
 # System configuration / thresholds
 # -------------------------------- #
 min_dist  = 100
 max_dist  = 3_000
+use_asyncio = False       # True => runtime.py tasks instead of the main loop.
 
 
 # Flags updated by interrupts (shared with main loop)
 # -------------------------------------------------- #
 sys_on = False            # System ON/OFF state (controlled by buttons)
+buttons_enabled = True    # False after a LOCK command (buttons ignored).
 last_green_press = 0      # Debounce timer for buttons.
 last_red_press = 0 
 debounce_ms = 300         # (maybe we need two different ones)
 last_pir_trigger  = 0     # Debounce timer for PIR.
 pir_active = False        # Current PIR state (True = motion detected).
 
-# --------------- #
-# Debug printing
-VERBOSE = True
-def dbg(*parts):
-    if VERBOSE:
-        print(*parts)
 
-
-# Interrupt handlers.
-# ----------------------------------------------#
+# Interrupt handlers: record the edge only (see events.py) ...
+# ----------------------------------------------------------- #
 def green_irq(pin):
+    events.post(events.GREEN, ticks_ms())
+
+def red_irq(pin):
+    events.post(events.RED, ticks_ms())
+
+def pir_irq(pin):
+    events.post(events.PIR_RISE if pin.value() else events.PIR_FALL, ticks_ms())
+
+
+# ... and act on it from events.drain(), outside interrupt context.
+# ---------------------------------------------------------------- #
+def _on_green(event, now):
     global last_green_press, sys_on
-    now = ticks_ms()
+    if not buttons_enabled:
+        return
     # Debounce.
     if ticks_diff(now, last_green_press) < debounce_ms:
         return
     last_green_press = now
     if not sys_on:
         sys_on = True
-        dbg("Green => System ON")
+        log.info(log.IO, "Green => System ON")
 
-def red_irq(pin):
+def _on_red(event, now):
     global last_red_press, sys_on
-    now = ticks_ms()
+    if not buttons_enabled:
+        return
     if ticks_diff(now, last_red_press) < debounce_ms:
         return
     last_red_press = now
     if sys_on:
         sys_on= False
-        dbg("Red => System OFF")
+        log.info(log.IO, "Red => System OFF")
 
-def pir_irq(pin):
+def _on_pir(event, now):
     global pir_active, last_pir_trigger
 
     # Ignore PIR if system is OFF.
     if not sys_on:
         return
 
-    now = ticks_ms()
     # Debounce for PIR  (should be reconsidewred)
     if ticks_diff(now, last_pir_trigger) < 200:
         return
     last_pir_trigger = now
 
-    pir_active = bool(pin.value())
-    dbg(f"IRQ: PIR state changed => {'ACTIVE' if pir_active else 'INACTIVE'}")
+    pir_active = event == events.PIR_RISE
+    log.debug(log.IO, "PIR state changed =>", "ACTIVE" if pir_active else "INACTIVE")
+
+events.subscribe(events.GREEN, _on_green)
+events.subscribe(events.RED, _on_red)
+events.subscribe(events.PIR_RISE, _on_pir)
+events.subscribe(events.PIR_FALL, _on_pir)